@@ -16,7 +16,8 @@ import { Room } from "livekit-client";
 interface VoiceInputModalProps {
   open: boolean;
   onOpenChange: (open: boolean) => void;
-  onTranscription: (text: string) => void;
+  // roomName ties later API requests to this voice session's trace
+  onTranscription: (text: string, roomName: string) => void;
 }
 
 function VoiceAssistantContent({
@@ -141,7 +142,11 @@ function VoiceAssistantContent({
 }
 
 export const VoiceInputModal = ({ open, onOpenChange, onTranscription }: VoiceInputModalProps) => {
-  const [connectionDetails, setConnectionDetails] = useState<{ token: string; url: string } | null>(null);
+  const [connectionDetails, setConnectionDetails] = useState<{
+    token: string;
+    url: string;
+    roomName: string;
+  } | null>(null);
   const [isLoading, setIsLoading] = useState(false);
 
   useEffect(() => {
@@ -163,6 +168,7 @@ export const VoiceInputModal = ({ open, onOpenChange, onTranscription }: VoiceIn
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "X-Room-Name": roomName,
         },
         body: JSON.stringify({
           room_name: roomName,
@@ -175,7 +181,7 @@ export const VoiceInputModal = ({ open, onOpenChange, onTranscription }: VoiceIn
       }
 
       const data = await response.json();
-      setConnectionDetails({ token: data.token, url: data.url });
+      setConnectionDetails({ token: data.token, url: data.url, roomName });
     } catch (error) {
       console.error("Error connecting to LiveKit:", error);
       toast.error("Failed to connect to voice service. Please try again.");
@@ -216,7 +222,10 @@ export const VoiceInputModal = ({ open, onOpenChange, onTranscription }: VoiceIn
             video={false}
             onDisconnected={handleClose}
           >
-            <VoiceAssistantContent onTranscription={onTranscription} onClose={handleClose} />
+            <VoiceAssistantContent
+              onTranscription={(text) => onTranscription(text, connectionDetails.roomName)}
+              onClose={handleClose}
+            />
           </LiveKitRoom>
         )}
 
@@ -37,6 +37,9 @@ const Index = () => {
   const [uploadedImage, setUploadedImage] = useState<File | null>(null);
   const [imagePreview, setImagePreview] = useState<string | null>(null);
   const [isUploadingImage, setIsUploadingImage] = useState(false);
+  // LiveKit room of the voice session, sent with API requests so the backend
+  // can trace the whole flow as one trace
+  const [roomName, setRoomName] = useState<string | null>(null);
 
   const stepLabels = ["About them", "Song style", "Preview & Generate"];
 
@@ -101,10 +104,13 @@ const Index = () => {
     });
   };
 
-  const handleVoiceTranscription = (text: string) => {
+  const handleVoiceTranscription = (text: string, voiceRoomName: string) => {
     setFriendDescription(text);
+    setRoomName(voiceRoomName);
   };
 
+  const traceHeaders = (): Record<string, string> => (roomName ? { "X-Room-Name": roomName } : {});
+
   const handleImageUpload = (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0];
     if (file) {
@@ -178,12 +184,20 @@ Now write the full song.`;
     console.log(prompt);
 
     try {
-      // Call the backend API to generate music
       const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+
+      // Song and video in one request: the backend uploads the photo while the song is generated
+      if (includeVideo) {
+        await generatePackage(prompt, API_URL);
+        return;
+      }
+
+      // Call the backend API to generate music
       const response = await fetch(`${API_URL}/api/generate-music`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...traceHeaders(),
         },
         body: JSON.stringify({
           prompt: prompt,
@@ -203,12 +217,6 @@ Now write the full song.`;
         setMusicUrl(fullUrl);
         setMusicFilename(data.filename);
         toast.success("Music generated successfully! 🎵");
-
-        // Automatically generate video if the option is checked
-        if (includeVideo) {
-          // Trigger video generation automatically
-          await generateVideo(fullUrl, API_URL);
-        }
       } else {
         throw new Error("Music generation failed");
       }
@@ -220,65 +228,116 @@ Now write the full song.`;
     }
   };
 
-  const generateVideo = async (audioUrl: string, apiUrl: string) => {
+  // The photo to animate: the user's upload, or the selected genre's image
+  const getVideoImage = async (): Promise<{ blob: Blob; filename: string }> => {
+    if (uploadedImage) {
+      return { blob: uploadedImage, filename: uploadedImage.name };
+    }
+
+    const selectedGenreData = genres.find((g) => g.value === selectedGenre);
+    if (!selectedGenreData?.imagePath) {
+      throw new Error("No genre image found");
+    }
+
+    const imageResponse = await fetch(selectedGenreData.imagePath);
+    const imageBlob = await imageResponse.blob();
+    return { blob: imageBlob, filename: `genre_${selectedGenre}.png` };
+  };
+
+  const generatePackage = async (prompt: string, apiUrl: string) => {
     setIsGeneratingVideo(true);
-    setVideoUrl(null);
-    setVideoFilename(null);
 
     try {
-      let imageUrl: string;
+      const { blob, filename } = await getVideoImage();
 
-      // Use custom uploaded image or genre image
-      if (uploadedImage) {
-        setIsUploadingImage(true);
-        const formData = new FormData();
-        formData.append("image", uploadedImage);
+      const formData = new FormData();
+      formData.append("image", blob, filename);
+      formData.append("prompt", prompt);
+      formData.append("duration_seconds", "30");
+      formData.append("resolution", "480p");
 
-        const uploadResponse = await fetch(`${apiUrl}/api/upload-image`, {
-          method: "POST",
-          body: formData,
-        });
+      const response = await fetch(`${apiUrl}/api/generate-package`, {
+        method: "POST",
+        headers: traceHeaders(),
+        body: formData,
+      });
+
+      if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail || "Failed to start generation");
+      }
+
+      let job = await response.json();
+      let musicShown = false;
 
-        if (!uploadResponse.ok) {
-          throw new Error("Failed to upload image");
+      // Show the song as soon as it is ready, while the video is still rendering
+      const showMusic = () => {
+        if (job.music_url && !musicShown) {
+          setMusicUrl(`${apiUrl}${job.music_url}`);
+          setMusicFilename(job.music_filename);
+          toast.success("Music generated successfully! 🎵");
+          musicShown = true;
         }
+      };
 
-        const uploadData = await uploadResponse.json();
-        imageUrl = uploadData.image_url;
-        setIsUploadingImage(false);
-      } else {
-        // Use the genre image instead
-        const selectedGenreData = genres.find((g) => g.value === selectedGenre);
-        if (!selectedGenreData?.imagePath) {
-          throw new Error("No genre image found");
+      while (job.status === "running") {
+        showMusic();
+        await new Promise((resolve) => setTimeout(resolve, 3000));
+
+        const statusResponse = await fetch(`${apiUrl}/api/generate-package/${job.job_id}`, {
+          headers: traceHeaders(),
+        });
+        if (!statusResponse.ok) {
+          throw new Error("Failed to check generation progress");
         }
+        job = await statusResponse.json();
+      }
+      showMusic();
+
+      if (job.status !== "done" || !job.file_url) {
+        throw new Error(job.error || "Video generation failed");
+      }
+
+      setVideoUrl(`${apiUrl}${job.file_url}`);
+      setVideoFilename(job.filename);
+      toast.success("Video generated successfully! 🎥");
+    } finally {
+      setIsGeneratingVideo(false);
+    }
+  };
 
-        // Fetch the genre image and upload it
-        setIsUploadingImage(true);
-        const imageResponse = await fetch(selectedGenreData.imagePath);
-        const imageBlob = await imageResponse.blob();
+  const generateVideo = async (audioUrl: string, apiUrl: string) => {
+    setIsGeneratingVideo(true);
+    setVideoUrl(null);
+    setVideoFilename(null);
 
-        const formData = new FormData();
-        formData.append("image", imageBlob, `genre_${selectedGenre}.png`);
+    try {
+      // Upload the custom image or the genre image
+      setIsUploadingImage(true);
+      const { blob, filename } = await getVideoImage();
 
-        const uploadResponse = await fetch(`${apiUrl}/api/upload-image`, {
-          method: "POST",
-          body: formData,
-        });
+      const formData = new FormData();
+      formData.append("image", blob, filename);
 
-        if (!uploadResponse.ok) {
-          throw new Error("Failed to upload genre image");
-        }
+      const uploadResponse = await fetch(`${apiUrl}/api/upload-image`, {
+        method: "POST",
+        headers: traceHeaders(),
+        body: formData,
+      });
 
-        const uploadData = await uploadResponse.json();
-        imageUrl = uploadData.image_url;
-        setIsUploadingImage(false);
+      if (!uploadResponse.ok) {
+        throw new Error("Failed to upload image");
       }
 
+      const uploadData = await uploadResponse.json();
+      const imageUrl = uploadData.image_url;
+      setIsUploadingImage(false);
+
       const response = await fetch(`${apiUrl}/api/generate-video`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...traceHeaders(),
         },
         body: JSON.stringify({
           audio_url: audioUrl,
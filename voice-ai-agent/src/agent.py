@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import os
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
 from elevenlabs.client import ElevenLabs
@@ -10,26 +12,33 @@ from livekit.agents import (
     Agent,
     AgentServer,
     AgentSession,
+    ConversationItemAddedEvent,
     JobContext,
+    JobExecutorType,
     JobProcess,
+    MetricsCollectedEvent,
     RunContext,
     cli,
     function_tool,
     inference,
+    metrics,
     room_io,
+    telemetry,
 )
 from livekit.plugins import noise_cancellation, silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from opentelemetry import context as otel_context
+
+from density import DENSITY_MODE, RoomUsage, current_room, shared_models
+from session_store import RoomSession, SessionStore, compact_chat_ctx
+from tracing import room_context, setup_tracing, tracer
 
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
 
-class Assistant(Agent):
-    def __init__(self) -> None:
-        super().__init__(
-            instructions="""You are a helpful transcription assistant. Your role is to listen carefully to the user and transcribe exactly what they say about their friend.
+INSTRUCTIONS = """You are a helpful transcription assistant. Your role is to listen carefully to the user and transcribe exactly what they say about their friend.
 
 When the user speaks, simply repeat back what they said in a clear, well-formatted way. Do not add extra commentary, questions, or suggestions - just provide a clean transcription of their words.
 
@@ -37,9 +46,25 @@ For example:
 User says: "My friend Sarah loves hiking and always brings snacks for everyone"
 You respond: "My friend Sarah loves hiking and always brings snacks for everyone"
 
-Keep responses concise and focused on accurate transcription.""",
-        )
-        
+Keep responses concise and focused on accurate transcription."""
+
+
+class Assistant(Agent):
+    def __init__(self, room_session: Optional[RoomSession] = None) -> None:
+        # Per-room state (summary, artifacts, compacted chat context)
+        # carried over from earlier sessions in the same room
+        self.room_session = room_session
+        # Referenced so the pending compaction isn't garbage collected
+        self._compaction: Optional[asyncio.Task] = None
+
+        if room_session is not None:
+            super().__init__(
+                instructions=self._build_instructions(),
+                chat_ctx=room_session.load_chat_ctx(),
+            )
+        else:
+            super().__init__(instructions=INSTRUCTIONS)
+
         # Initialize ElevenLabs client for music generation
         api_key = os.getenv("ELEVENLABS_API_KEY")
         if not api_key:
@@ -52,6 +77,48 @@ Keep responses concise and focused on accurate transcription.""",
         self.music_dir = Path("generated_music")
         self.music_dir.mkdir(exist_ok=True)
 
+    def _build_instructions(self) -> str:
+        recalled = self.room_session.recall() if self.room_session else ""
+        if not recalled:
+            return INSTRUCTIONS
+
+        return (
+            f"{INSTRUCTIONS}\n\n"
+            f"Earlier in this conversation the user told you: {recalled}"
+        )
+
+    async def on_enter(self) -> None:
+        if self.room_session is not None:
+            self.session.on("conversation_item_added", self._on_conversation_item_added)
+
+    async def on_exit(self) -> None:
+        if self.room_session is not None:
+            self.session.off(
+                "conversation_item_added", self._on_conversation_item_added
+            )
+
+    def _on_conversation_item_added(self, ev: ConversationItemAddedEvent) -> None:
+        # Compact once the reply is in the history rather than in
+        # on_user_turn_completed: changing the turn's context there would throw
+        # away the reply the session has already generated preemptively
+        if ev.item.type == "message" and ev.item.role == "assistant":
+            self._compaction = asyncio.create_task(self.compact_history())
+
+    async def compact_history(self) -> None:
+        """
+        Keep the prompt bounded: fold turns that fall out of the chat window into
+        the summary that is carried in the instructions.
+        """
+        chat_ctx = self.chat_ctx.copy()
+        dropped = compact_chat_ctx(chat_ctx)
+        if len(chat_ctx.items) < len(self.chat_ctx.items):
+            for text in dropped:
+                self.room_session.remember(text)
+            await self.update_chat_ctx(chat_ctx)
+            await self.update_instructions(self._build_instructions())
+
+        self.room_session.save_chat_ctx(self.chat_ctx)
+
     @function_tool
     async def generate_music(self, context: RunContext, prompt: str, duration_seconds: int = 30):
         """Generate music based on a text prompt and save it locally.
@@ -75,16 +142,20 @@ Keep responses concise and focused on accurate transcription.""",
         
         try:
             # Generate music using ElevenLabs API
-            stream = self.elevenlabs.music.stream(
-                prompt=prompt,
-                music_length_ms=duration_ms,
-            )
-            
-            # Collect audio data
-            audio_chunks = []
-            for chunk in stream:
-                if chunk:
-                    audio_chunks.append(chunk)
+            with tracer.start_as_current_span(
+                "elevenlabs.music.stream",
+                attributes={"music.duration_seconds": duration_seconds},
+            ):
+                stream = self.elevenlabs.music.stream(
+                    prompt=prompt,
+                    music_length_ms=duration_ms,
+                )
+                
+                # Collect audio data
+                audio_chunks = []
+                for chunk in stream:
+                    if chunk:
+                        audio_chunks.append(chunk)
             
             if not audio_chunks:
                 return "Sorry, I couldn't generate any music. Please try a different prompt."
@@ -97,11 +168,20 @@ Keep responses concise and focused on accurate transcription.""",
             filename = f"music_{timestamp}.mp3"
             filepath = self.music_dir / filename
             
-            with open(filepath, "wb") as f:
+            with (
+                tracer.start_as_current_span(
+                    "save_music",
+                    attributes={"file.name": filename, "file.size": len(audio_data)},
+                ),
+                open(filepath, "wb") as f,
+            ):
                 f.write(audio_data)
             
             logger.info(f"Music saved to {filepath}")
-            
+
+            if self.room_session is not None:
+                self.room_session.add_artifact(filename)
+
             return f"I've created your music and saved it to {filepath}. The track is {duration_seconds} seconds long. Enjoy!"
             
         except Exception as e:
@@ -126,11 +206,37 @@ Keep responses concise and focused on accurate transcription.""",
     #     return "sunny with a temperature of 70 degrees."
 
 
-server = AgentServer()
+# In density mode rooms run as threads of one process so they can share models
+# (see density.py); otherwise each room gets its own job process
+server = (
+    AgentServer(job_executor_type=JobExecutorType.THREAD)
+    if DENSITY_MODE
+    else AgentServer()
+)
+
+
+def select_noise_cancellation(params):
+    """Pick a new telephony or standard filter for a participant."""
+    if params.participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP:
+        return noise_cancellation.BVCTelephony()
+    return noise_cancellation.BVC()
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    # Export our spans and the framework's (LLM, TTS, turns) if a collector or
+    # TRACES_FILE is configured (see tracing.py). Transcripts and LLM messages
+    # (what users say about their friends) are stripped before export.
+    tracer_provider = setup_tracing("birthdai-agent")
+    if tracer_provider is not None:
+        telemetry.set_tracer_provider(tracer_provider, allow_pii=False)
+
+    if DENSITY_MODE:
+        models = shared_models()
+        proc.userdata["models"] = models
+        proc.userdata["vad"] = models.vad
+    else:
+        proc.userdata["vad"] = silero.VAD.load()
+    proc.userdata["sessions"] = SessionStore(Path("session_state"))
 
 
 server.setup_fnc = prewarm
@@ -144,6 +250,28 @@ async def my_agent(ctx: JobContext):
         "room": ctx.room.name,
     }
 
+    # Join this room's trace, so tool calls line up with the API requests the
+    # frontend makes for the same room (see tracing.py)
+    otel_context.attach(room_context(ctx.log_context_fields["room"]))
+
+    # Conversation and artifact state for this room, kept across reconnects
+    sessions: SessionStore = ctx.proc.userdata["sessions"]
+    room_session = sessions.get(ctx.room.name)
+
+    models = ctx.proc.userdata.get("models")
+    if models is not None:
+        # Attribute shared turn-detector work to this room
+        current_room.set(ctx.room.name)
+        turn_detection = models.turn_detector
+        noise_cancellation_selector = models.noise_cancellation
+    else:
+        turn_detection = MultilingualModel()
+        noise_cancellation_selector = select_noise_cancellation
+
+    room_usage = RoomUsage(
+        ctx.room.name, models.inference_executor if models is not None else None
+    )
+
     # Set up a voice AI pipeline using OpenAI, Cartesia, AssemblyAI, and the LiveKit turn detector
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
@@ -159,13 +287,37 @@ async def my_agent(ctx: JobContext):
         ),
         # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
         # See more at https://docs.livekit.io/agents/build/turns
-        turn_detection=MultilingualModel(),
+        turn_detection=turn_detection,
         vad=ctx.proc.userdata["vad"],
         # allow the LLM to generate a response while waiting for the end of turn
         # See more at https://docs.livekit.io/agents/build/audio/#preemptive-generation
         preemptive_generation=True,
     )
 
+    # Track prompt size and LLM latency per turn so long sessions can be checked
+    # for unbounded context growth
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        if isinstance(ev.metrics, metrics.LLMMetrics):
+            room_session.record_turn(
+                prompt_tokens=ev.metrics.prompt_tokens,
+                completion_tokens=ev.metrics.completion_tokens,
+                ttft=ev.metrics.ttft,
+                duration=ev.metrics.duration,
+            )
+        elif isinstance(ev.metrics, metrics.VADMetrics):
+            room_usage.vad_seconds += ev.metrics.inference_duration_total
+
+    assistant = Assistant(room_session=room_session)
+
+    async def save_room_session():
+        room_session.save_chat_ctx(assistant.chat_ctx)
+        logger.info(f"Session stats: {room_session.stats()}")
+        logger.info(f"Room usage: {room_usage.report()}")
+        sessions.release(ctx.room.name)
+
+    ctx.add_shutdown_callback(save_room_session)
+
     # To use a realtime model instead of a voice pipeline, use the following session setup instead.
     # (Note: This is for the OpenAI Realtime API. For other providers, see https://docs.livekit.io/agents/models/realtime/))
     # 1. Install livekit-agents[openai]
@@ -186,13 +338,11 @@ async def my_agent(ctx: JobContext):
 
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=Assistant(),
+        agent=assistant,
         room=ctx.room,
         room_options=room_io.RoomOptions(
             audio_input=room_io.AudioInputOptions(
-                noise_cancellation=lambda params: noise_cancellation.BVCTelephony()
-                if params.participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP
-                else noise_cancellation.BVC(),
+                noise_cancellation=noise_cancellation_selector,
             ),
         ),
     )
@@ -1,30 +1,74 @@
 import asyncio
+import io
 import logging
-import os
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
-import requests
-import time
+from typing import Callable, Optional
 
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
-import fal_client
-from pydub import AudioSegment
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from fastapi import UploadFile, File as FastAPIFile
-from livekit import api
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, StatusCode
+
+from artifacts import (
+    PUBLIC_BASE_URLS,
+    ArtifactNotFoundError,
+    ArtifactResolver,
+    RemoteAudioRejectedError,
+)
+from resilience import CircuitOpenError, Deadline, Upstream, UpstreamTimeoutError
+from tracing import (
+    ROOM_ATTRIBUTE,
+    ROOM_HEADER,
+    current_trace_id,
+    record_room_root,
+    room_context,
+    setup_tracing,
+    shutdown_tracing,
+    tracer,
+)
+from upstreams import UpstreamClients
+
+# The ElevenLabs, fal.ai and LiveKit SDKs, pydub and requests are imported on
+# first use (see upstreams.py) so the server starts answering probes quickly
 
 logger = logging.getLogger("api_server")
 logging.basicConfig(level=logging.INFO)
 
 load_dotenv(".env.local")
 
-app = FastAPI(title="BirthdAI Music Generation API")
+# Directory for saved music, served under /music
+music_dir = Path("generated_music")
+
+# Directory for saved videos, served under /videos
+video_dir = Path("generated_videos")
+
+# Upstream clients, created on first use; started and closed by the lifespan
+clients = UpstreamClients(directories=(music_dir, video_dir))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_tracing("birthdai-api")
+    clients.start()
+    logger.info(f"API server ready in {clients.startup_seconds * 1000:.1f}ms")
+    # Load the SDKs in the background so the first request doesn't pay for them
+    clients.warm()
+    yield
+    clients.close()
+    shutdown_tracing()
+
+
+app = FastAPI(title="BirthdAI Music Generation API", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -33,39 +77,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
-# Initialize ElevenLabs client
-api_key = os.getenv("ELEVENLABS_API_KEY")
-if not api_key:
-    logger.warning("ELEVENLABS_API_KEY not found. Music generation will not be available.")
-    elevenlabs_client = None
-else:
-    elevenlabs_client = ElevenLabs(api_key=api_key)
-
-# Create directory for saved music if it doesn't exist
-music_dir = Path("generated_music")
-music_dir.mkdir(exist_ok=True)
-
-# Create directory for saved videos
-video_dir = Path("generated_videos")
-video_dir.mkdir(exist_ok=True)
-
-# Mount the music directory to serve files
-app.mount("/music", StaticFiles(directory=str(music_dir)), name="music")
-app.mount("/videos", StaticFiles(directory=str(video_dir)), name="videos")
 
-# Get FAL API key
-fal_api_key = os.getenv("FAL_KEY")
-if not fal_api_key:
-    logger.warning("FAL_KEY not found. Video generation will not be available.")
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Record a server span for every request.
 
-# Get LiveKit credentials
-livekit_url = os.getenv("LIVEKIT_URL")
-livekit_api_key = os.getenv("LIVEKIT_API_KEY")
-livekit_api_secret = os.getenv("LIVEKIT_API_SECRET")
-if not all([livekit_url, livekit_api_key, livekit_api_secret]):
-    logger.warning("LiveKit credentials not found. Voice agent features will not be available.")
+    Requests carrying a W3C traceparent continue that trace; requests with an
+    X-Room-Name header join the LiveKit room's trace, alongside the agent's spans.
+    """
+    room_name = request.headers.get(ROOM_HEADER)
+    if "traceparent" in request.headers:
+        parent = propagate.extract(request.headers)
+    elif room_name:
+        parent = room_context(room_name)
+    else:
+        parent = None
+
+    with tracer.start_as_current_span(
+        f"{request.method} {request.url.path}",
+        context=parent,
+        kind=SpanKind.SERVER,
+        attributes={"http.request.method": request.method, "url.path": request.url.path},
+    ) as span:
+        if room_name:
+            span.set_attribute(ROOM_ATTRIBUTE, room_name)
+
+        response = await call_next(request)
+
+        route = request.scope.get("route")
+        if route is not None and hasattr(route, "path"):
+            span.update_name(f"{request.method} {route.path}")
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(StatusCode.ERROR)
+
+        trace_id = current_trace_id()
+        if trace_id:
+            response.headers["X-Trace-Id"] = trace_id
+        return response
+
+# Mount the music and video directories to serve files; they are created at startup
+app.mount("/music", StaticFiles(directory=str(music_dir), check_dir=False), name="music")
+app.mount("/videos", StaticFiles(directory=str(video_dir), check_dir=False), name="videos")
+
+# Maps audio URLs that point back at this server to files in music_dir
+artifact_resolver = ArtifactResolver(music_dir, PUBLIC_BASE_URLS)
 
 
 class MusicGenerationRequest(BaseModel):
@@ -94,6 +155,27 @@ class VideoGenerationResponse(BaseModel):
     video_url: Optional[str] = None
 
 
+class PackageStage(BaseModel):
+    name: str
+    status: str = "pending"  # pending, running, done, failed or skipped
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    detail: Optional[str] = None
+
+
+class PackageJob(BaseModel):
+    job_id: str
+    status: str = "running"  # running, done or failed
+    created_at: float
+    stages: list[PackageStage]
+    music_filename: Optional[str] = None
+    music_url: Optional[str] = None
+    filename: Optional[str] = None
+    file_url: Optional[str] = None
+    video_url: Optional[str] = None
+    error: Optional[str] = None
+
+
 class LiveKitTokenRequest(BaseModel):
     room_name: str
     participant_name: str
@@ -104,14 +186,282 @@ class LiveKitTokenResponse(BaseModel):
     url: str
 
 
-@app.get("/")
-async def root():
-    return {
+# fal.ai model used to animate the photo with the song
+VIDEO_MODEL = "veed/fabric-1.0/fast"
+
+# Only the start of the song is used for the video, to save credits
+VIDEO_AUDIO_MS = 5000
+
+# Overall time budgets, covering retries, polling and downloads
+MUSIC_TIMEOUT_SECONDS = 240
+VIDEO_TIMEOUT_SECONDS = 300
+
+# Seconds between fal.ai status polls while a video renders
+VIDEO_POLL_INTERVAL_SECONDS = 5
+# A status poll still pending after this long gets a second, hedged request
+FAL_STATUS_HEDGE_SECONDS = 2.0
+
+# Circuit breakers, retries and metrics for each upstream (see resilience.py)
+elevenlabs_upstream = Upstream("elevenlabs")
+fal_upstream = Upstream("fal")
+
+
+def upstream_error(e: Exception, action: str) -> HTTPException:
+    """Turn a failure from an upstream call into the matching HTTP error."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail=f"{action} is temporarily unavailable: {e}",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    if isinstance(e, UpstreamTimeoutError):
+        return HTTPException(status_code=504, detail=f"{action} failed: {e}")
+    return HTTPException(status_code=500, detail=f"{action} failed: {str(e)}")
+
+
+def compose_music(prompt: str, duration_seconds: int) -> bytes:
+    """
+    Generate music with ElevenLabs.
+
+    Args:
+        prompt: Description of the music to generate
+        duration_seconds: Length of the track, clamped to 10-120 seconds
+
+    Returns:
+        The MP3 audio data
+    """
+    duration_seconds = max(10, min(duration_seconds, 120))
+    deadline = Deadline(MUSIC_TIMEOUT_SECONDS)
+
+    def stream_music() -> bytes:
+        stream = clients.elevenlabs.music.stream(
+            prompt=prompt,
+            music_length_ms=duration_seconds * 1000,
+        )
+
+        chunks = []
+        for chunk in stream:
+            deadline.check("Music generation")
+            if chunk:
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    # Each attempt starts (and bills) a new generation, so it isn't retried,
+    # like the fal.ai render submit
+    return elevenlabs_upstream.call(stream_music, deadline=deadline)
+
+
+def save_music(audio_data: bytes) -> str:
+    """Save MP3 data to the music directory and return its filename."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"music_{timestamp}.mp3"
+    filepath = music_dir / filename
+
+    with (
+        tracer.start_as_current_span(
+            "save_music",
+            attributes={"file.name": filename, "file.size": len(audio_data)},
+        ),
+        open(filepath, "wb") as f,
+    ):
+        f.write(audio_data)
+
+    logger.info(f"Music saved to {filepath}")
+    return filename
+
+
+def upload_to_fal(data: bytes, content_type: str, file_name: str) -> str:
+    """Upload data to fal.ai storage and return its URL."""
+    return fal_upstream.call(
+        clients.fal.upload, data, content_type, file_name, attempts=2
+    )
+
+
+def trim_audio(audio_data: bytes, length_ms: int = VIDEO_AUDIO_MS) -> bytes:
+    """Cut MP3 data down to its first `length_ms` milliseconds, in memory."""
+    from pydub import AudioSegment
+
+    with tracer.start_as_current_span(
+        "trim_audio",
+        attributes={"audio.input_size": len(audio_data), "audio.length_ms": length_ms},
+    ):
+        audio = AudioSegment.from_file(io.BytesIO(audio_data), format="mp3")
+        buffer = io.BytesIO()
+        audio[:length_ms].export(buffer, format="mp3")
+        return buffer.getvalue()
+
+
+def render_video(
+    image_url: str,
+    audio_url: str,
+    resolution: str,
+    on_progress: Optional[Callable[[str], None]] = None,
+) -> tuple[str, str]:
+    """
+    Render a video with fal.ai Fabric 1.0 and save it locally.
+
+    Args:
+        image_url: fal.ai URL of the photo to animate
+        audio_url: fal.ai URL of the soundtrack
+        resolution: Output resolution, e.g. "720p"
+        on_progress: Called with each progress message reported by fal.ai
+
+    Returns:
+        The saved video filename and the fal.ai video URL
+    """
+    import fal_client
+    import requests
+
+    fal = clients.fal
+    deadline = Deadline(VIDEO_TIMEOUT_SECONDS)
+
+    # Submit the video generation request. Not retried, so a request that timed
+    # out after reaching fal.ai can't start (and bill) a second render.
+    logger.info("Submitting video generation request to fal.ai...")
+    handler = fal_upstream.call(
+        fal.submit,
+        VIDEO_MODEL,
+        arguments={
+            "image_url": image_url,
+            "audio_url": audio_url,
+            "resolution": resolution
+        },
+        deadline=deadline,
+    )
+
+    request_id = handler.request_id
+    logger.info(f"Video generation request submitted with ID: {request_id}")
+    trace.get_current_span().set_attribute("fal.request_id", request_id)
+
+    poll = 0
+    while True:
+        deadline.check("Video generation")
+        poll += 1
+
+        # Check status; a slow poll is hedged with a second request
+        with tracer.start_as_current_span(
+            "render_video.poll", attributes={"fal.request_id": request_id, "poll": poll}
+        ) as poll_span:
+            status_response = fal_upstream.call(
+                fal.status,
+                VIDEO_MODEL,
+                request_id,
+                with_logs=True,
+                attempts=2,
+                deadline=deadline,
+                hedge_after=FAL_STATUS_HEDGE_SECONDS,
+            )
+            poll_span.set_attribute("fal.status", type(status_response).__name__)
+
+        # Handle different status types
+        if isinstance(status_response, (fal_client.Queued, fal_client.InProgress)):
+            logger.info("Video generation in progress...")
+
+            # Log any progress messages
+            if hasattr(status_response, 'logs') and status_response.logs:
+                for log in status_response.logs:
+                    if isinstance(log, dict) and 'message' in log:
+                        logger.info(f"Progress: {log['message']}")
+                        if on_progress:
+                            on_progress(log['message'])
+
+            # Wait before next poll
+            logger.info(f"Waiting {VIDEO_POLL_INTERVAL_SECONDS} seconds before next status check...")
+            time.sleep(min(VIDEO_POLL_INTERVAL_SECONDS, deadline.remaining()))
+            continue
+
+        elif isinstance(status_response, fal_client.Completed):
+            logger.info("Video generation completed!")
+            break
+
+        else:
+            # Handle other status types or errors
+            logger.error(f"Unexpected status response: {type(status_response)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Video generation failed with unexpected status"
+            )
+
+    # Get the final result
+    result = fal_upstream.call(
+        fal.result, VIDEO_MODEL, request_id, attempts=2, deadline=deadline
+    )
+
+    if not result or "video" not in result:
+        raise HTTPException(
+            status_code=500,
+            detail="No video data was generated. Please try again."
+        )
+
+    video_data = result["video"]
+    video_url = video_data.get("url")
+
+    if not video_url:
+        raise HTTPException(
+            status_code=500,
+            detail="Video URL not found in response."
+        )
+
+    logger.info(f"Video generated successfully: {video_url}")
+
+    # Save to file with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"video_{timestamp}.mp4"
+    filepath = video_dir / filename
+
+    # Download the video and save it locally
+    def download_video():
+        with requests.get(video_url, stream=True, timeout=(10, 60)) as response:
+            response.raise_for_status()
+            with open(filepath, "wb") as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    deadline.check("Video download")
+                    f.write(chunk)
+
+    fal_upstream.call(download_video, attempts=2, deadline=deadline)
+
+    logger.info(f"Video saved to {filepath}")
+
+    return filename, video_url
+
+
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness():
+    """
+    Readiness probe: startup has finished and requests can be handled.
+
+    Returns 503 until the lifespan has started the upstream registry. The body
+    reports which upstreams are configured and which SDKs are already loaded.
+    """
+    body = {
         "service": "BirthdAI Music Generation API",
-        "status": "running",
-        "elevenlabs_configured": elevenlabs_client is not None,
-        "fal_configured": fal_api_key is not None,
-        "livekit_configured": all([livekit_url, livekit_api_key, livekit_api_secret])
+        "status": "ready" if clients.ready else "starting",
+        "startup_ms": (
+            round(clients.startup_seconds * 1000, 1)
+            if clients.startup_seconds is not None
+            else None
+        ),
+        **clients.status(),
+    }
+    return JSONResponse(body, status_code=200 if clients.ready else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Call counts, latency percentiles and circuit breaker state per upstream."""
+    return {
+        "upstreams": {
+            upstream.name: upstream.snapshot()
+            for upstream in (elevenlabs_upstream, fal_upstream)
+        }
     }
 
 
@@ -126,14 +476,18 @@ async def generate_livekit_token(request: LiveKitTokenRequest):
     Returns:
         Response with access token and LiveKit server URL
     """
-    if not all([livekit_url, livekit_api_key, livekit_api_secret]):
+    if not clients.livekit_configured:
         raise HTTPException(
             status_code=503,
             detail="LiveKit is not configured. Please set LIVEKIT_URL, LIVEKIT_API_KEY, and LIVEKIT_API_SECRET."
         )
     
     try:
-        token = api.AccessToken(livekit_api_key, livekit_api_secret) \
+        api = clients.livekit_api
+        trace.get_current_span().set_attribute(ROOM_ATTRIBUTE, request.room_name)
+        # The room's spans, from here and from the agent, hang off this root
+        record_room_root(request.room_name)
+        token = api.AccessToken(clients.livekit_api_key, clients.livekit_api_secret) \
             .with_identity(request.participant_name) \
             .with_name(request.participant_name) \
             .with_grants(api.VideoGrants(
@@ -147,7 +501,7 @@ async def generate_livekit_token(request: LiveKitTokenRequest):
         
         return LiveKitTokenResponse(
             token=jwt_token,
-            url=livekit_url
+            url=clients.livekit_url
         )
         
     except Exception as e:
@@ -169,7 +523,7 @@ async def generate_music(request: MusicGenerationRequest):
     Returns:
         Response with success status, message, filename, and file URL
     """
-    if not elevenlabs_client:
+    if not clients.elevenlabs_configured:
         raise HTTPException(
             status_code=503,
             detail="Music generation is not available. ELEVENLABS_API_KEY is not configured."
@@ -177,41 +531,22 @@ async def generate_music(request: MusicGenerationRequest):
     
     # Limit duration to reasonable range
     duration_seconds = max(10, min(request.duration_seconds, 120))
-    duration_ms = duration_seconds * 1000
     
     logger.info(f"Generating music: {request.prompt} ({duration_seconds}s)")
     
     try:
-        # Generate music using ElevenLabs API
-        stream = elevenlabs_client.music.stream(
-            prompt=request.prompt,
-            music_length_ms=duration_ms,
+        # Generate music using ElevenLabs API, off the event loop
+        audio_data = await asyncio.to_thread(
+            compose_music, request.prompt, duration_seconds
         )
         
-        # Collect audio data
-        audio_chunks = []
-        for chunk in stream:
-            if chunk:
-                audio_chunks.append(chunk)
-        
-        if not audio_chunks:
+        if not audio_data:
             raise HTTPException(
                 status_code=500,
                 detail="No audio data was generated. Please try a different prompt."
             )
         
-        # Combine all chunks
-        audio_data = b"".join(audio_chunks)
-        
-        # Save to file with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"music_{timestamp}.mp3"
-        filepath = music_dir / filename
-        
-        with open(filepath, "wb") as f:
-            f.write(audio_data)
-        
-        logger.info(f"Music saved to {filepath}")
+        filename = save_music(audio_data)
         
         # Return the file URL (relative to the API server)
         file_url = f"/music/{filename}"
@@ -225,10 +560,7 @@ async def generate_music(request: MusicGenerationRequest):
         
     except Exception as e:
         logger.error(f"Music generation failed: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Music generation failed: {str(e)}"
-        )
+        raise upstream_error(e, "Music generation")
 
 
 @app.get("/api/list-music")
@@ -260,7 +592,7 @@ async def upload_image(image: UploadFile = FastAPIFile(...)):
     Returns:
         JSON with the uploaded image URL
     """
-    if not fal_api_key:
+    if not clients.fal_configured:
         raise HTTPException(
             status_code=503,
             detail="Image upload is not available. FAL_KEY is not configured."
@@ -284,7 +616,9 @@ async def upload_image(image: UploadFile = FastAPIFile(...)):
         logger.info(f"Uploading image to fal.ai: {temp_filepath}")
         
         # Upload to fal.ai
-        image_url = fal_client.upload_file(str(temp_filepath))
+        image_url = await asyncio.to_thread(
+            fal_upstream.call, clients.fal.upload_file, str(temp_filepath), attempts=2
+        )
         
         logger.info(f"Image uploaded to fal.ai: {image_url}")
         
@@ -302,24 +636,26 @@ async def upload_image(image: UploadFile = FastAPIFile(...)):
         # Clean up temp file if it exists
         if 'temp_filepath' in locals() and temp_filepath.exists():
             temp_filepath.unlink()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Image upload failed: {str(e)}"
-        )
+        raise upstream_error(e, "Image upload")
 
 
 @app.post("/api/generate-video", response_model=VideoGenerationResponse)
-async def generate_video(request: VideoGenerationRequest):
+async def generate_video(request: VideoGenerationRequest, http_request: Request):
     """
     Generate a video based on an audio file and image using fal.ai Fabric 1.0.
     
     Args:
-        request: Contains audio_url, image_url, and resolution
+        request: Contains audio_url, image_url, and resolution. audio_url may be
+            a song served by this server (absolute URL, /music/ path or filename)
+            or any remote audio URL
+        http_request: The incoming request, whose base URL also counts as ours
         
     Returns:
         Response with success status, message, filename, and video URL
     """
-    if not fal_api_key:
+    import requests
+
+    if not clients.fal_configured:
         raise HTTPException(
             status_code=503,
             detail="Video generation is not available. FAL_KEY is not configured."
@@ -328,138 +664,32 @@ async def generate_video(request: VideoGenerationRequest):
     logger.info(f"Generating video with audio: {request.audio_url}, image: {request.image_url}, resolution: {request.resolution}")
     
     try:
-        # Upload audio file to fal.ai if it's a local URL
-        audio_url = request.audio_url
-        if "localhost" in audio_url or audio_url.startswith("/"):
-            # Extract the local file path
-            if audio_url.startswith("http://localhost"):
-                # Extract just the path part
-                audio_path = audio_url.split("localhost:8000")[-1]
-            else:
-                audio_path = audio_url
-            
-            # Remove leading slash if present
-            if audio_path.startswith("/music/"):
-                filename = audio_path.replace("/music/", "")
-                local_audio_path = music_dir / filename
-                
-                if not local_audio_path.exists():
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Audio file not found: {filename}"
-                    )
-                
-                # Trim audio to 5 seconds for video generation to save credits
-                logger.info(f"Trimming audio to 5 seconds for video generation")
-                audio = AudioSegment.from_mp3(str(local_audio_path))
-                trimmed_audio = audio[:5000]  # First 5 seconds (5000 milliseconds)
-                
-                # Save trimmed audio to temp file
-                temp_audio_dir = Path("temp_uploads")
-                temp_audio_dir.mkdir(exist_ok=True)
-                trimmed_filename = f"trimmed_{filename}"
-                trimmed_audio_path = temp_audio_dir / trimmed_filename
-                trimmed_audio.export(str(trimmed_audio_path), format="mp3")
-                
-                logger.info(f"Uploading trimmed audio file to fal.ai: {trimmed_audio_path}")
-                audio_url = fal_client.upload_file(str(trimmed_audio_path))
-                logger.info(f"Audio uploaded to fal.ai: {audio_url}")
-                
-                # Clean up temp trimmed file
-                trimmed_audio_path.unlink()
-        
-        # Submit the video generation request
-        logger.info("Submitting video generation request to fal.ai...")
-        handler = fal_client.submit(
-            "veed/fabric-1.0/fast",
-            arguments={
-                "image_url": request.image_url,
-                "audio_url": audio_url,
-                "resolution": request.resolution
-            },
-        )
-        
-        request_id = handler.request_id
-        logger.info(f"Video generation request submitted with ID: {request_id}")
-        
-        # Poll for status with 5-second intervals
-        max_wait_time = 300  # 5 minutes maximum
-        start_time = time.time()
-        poll_interval = 5  # 5 seconds between polls
-        
-        while True:
-            elapsed_time = time.time() - start_time
-            
-            if elapsed_time > max_wait_time:
-                raise HTTPException(
-                    status_code=504,
-                    detail="Video generation timed out after 5 minutes"
-                )
-            
-            # Check status
-            status_response = fal_client.status("veed/fabric-1.0/fast", request_id, with_logs=True)
-            
-            # Handle different status types
-            if isinstance(status_response, fal_client.InProgress):
-                logger.info("Video generation in progress...")
-                
-                # Log any progress messages
-                if hasattr(status_response, 'logs') and status_response.logs:
-                    for log in status_response.logs:
-                        if isinstance(log, dict) and 'message' in log:
-                            logger.info(f"Progress: {log['message']}")
-                
-                # Wait 5 seconds before next poll
-                logger.info(f"Waiting {poll_interval} seconds before next status check...")
-                time.sleep(poll_interval)
-                continue
-                
-            elif isinstance(status_response, fal_client.Completed):
-                logger.info("Video generation completed!")
-                break
-                
-            else:
-                # Handle other status types or errors
-                logger.error(f"Unexpected status response: {type(status_response)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Video generation failed with unexpected status"
-                )
-        
-        # Get the final result
-        result = fal_client.result("veed/fabric-1.0/fast", request_id)
-        
-        if not result or "video" not in result:
-            raise HTTPException(
-                status_code=500,
-                detail="No video data was generated. Please try again."
+        # Our own songs are read from disk without a network hop, whatever
+        # hostname the frontend used; remote audio is downloaded once and cached
+        with tracer.start_as_current_span(
+            "resolve_audio", attributes={"audio.url": request.audio_url}
+        ) as span:
+            audio_path = await asyncio.to_thread(
+                artifact_resolver.resolve,
+                request.audio_url,
+                extra_base_urls=[str(http_request.base_url)],
             )
+            span.set_attribute("audio.local_path", str(audio_path))
+
+        # Trim audio to 5 seconds for video generation to save credits
+        logger.info(f"Trimming audio to 5 seconds for video generation")
+        trimmed_audio = await asyncio.to_thread(trim_audio, audio_path.read_bytes())
+
+        logger.info(f"Uploading trimmed audio to fal.ai: {audio_path.name}")
+        audio_url = await asyncio.to_thread(
+            upload_to_fal, trimmed_audio, "audio/mpeg", f"trimmed_{audio_path.stem}.mp3"
+        )
+        logger.info(f"Audio uploaded to fal.ai: {audio_url}")
         
-        video_data = result["video"]
-        video_url = video_data.get("url")
-        
-        if not video_url:
-            raise HTTPException(
-                status_code=500,
-                detail="Video URL not found in response."
-            )
-        
-        logger.info(f"Video generated successfully: {video_url}")
-        
-        # Download the video and save it locally
-        response = requests.get(video_url, stream=True)
-        response.raise_for_status()
-        
-        # Save to file with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"video_{timestamp}.mp4"
-        filepath = video_dir / filename
-        
-        with open(filepath, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        logger.info(f"Video saved to {filepath}")
+        # Render off the event loop, so other requests are served meanwhile
+        filename, video_url = await asyncio.to_thread(
+            render_video, request.image_url, audio_url, request.resolution
+        )
         
         # Return the local file URL
         file_url = f"/videos/{filename}"
@@ -472,6 +702,12 @@ async def generate_video(request: VideoGenerationRequest):
             video_url=video_url
         )
         
+    except ArtifactNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RemoteAudioRejectedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except requests.exceptions.RequestException as e:
         logger.error(f"Video download failed: {e}")
         raise HTTPException(
@@ -480,10 +716,213 @@ async def generate_video(request: VideoGenerationRequest):
         )
     except Exception as e:
         logger.error(f"Video generation failed: {e}")
+        raise upstream_error(e, "Video generation")
+
+
+# Stages of the birthday package pipeline, in the order they finish
+PACKAGE_STAGES = [
+    "upload_image",
+    "generate_music",
+    "trim_audio",
+    "upload_audio",
+    "render_video",
+]
+
+# Finished package jobs are kept this long for status polling
+PACKAGE_JOB_TTL_SECONDS = 3600
+
+package_jobs: dict[str, PackageJob] = {}
+# Keep references to running pipelines so they aren't garbage collected
+package_tasks: set[asyncio.Task] = set()
+
+
+async def run_stage(job: PackageJob, name: str, func: Callable, *args):
+    """Run a blocking pipeline stage in a worker thread, recording its progress."""
+    stage = next(s for s in job.stages if s.name == name)
+    stage.status = "running"
+    stage.started_at = time.time()
+
+    try:
+        with tracer.start_as_current_span(
+            f"stage {name}", attributes={"package.job_id": job.job_id}
+        ):
+            result = await asyncio.to_thread(func, *args)
+    except Exception as e:
+        stage.status = "failed"
+        stage.detail = e.detail if isinstance(e, HTTPException) else str(e)
+        raise
+    finally:
+        stage.finished_at = time.time()
+
+    stage.status = "done"
+    return result
+
+
+async def run_package_pipeline(
+    job: PackageJob,
+    image_data: bytes,
+    image_content_type: str,
+    image_filename: str,
+    prompt: str,
+    duration_seconds: int,
+    resolution: str,
+):
+    """
+    Build a birthday package: song plus a video of the photo singing it.
+
+    The photo upload runs concurrently with music generation, and the song is
+    trimmed and uploaded straight from memory instead of being re-read from disk.
+    """
+    def generate_and_save_music() -> bytes:
+        audio_data = compose_music(prompt, duration_seconds)
+        if not audio_data:
+            raise HTTPException(
+                status_code=500,
+                detail="No audio data was generated. Please try a different prompt."
+            )
+        job.music_filename = save_music(audio_data)
+        job.music_url = f"/music/{job.music_filename}"
+        return audio_data
+
+    # The pipeline outlives the request that started it, so it gets its own span
+    # (still in the request's trace)
+    with tracer.start_as_current_span(
+        "package_pipeline", attributes={"package.job_id": job.job_id}
+    ):
+        try:
+            first_stages = [
+                asyncio.create_task(
+                    run_stage(
+                        job,
+                        "upload_image",
+                        upload_to_fal,
+                        image_data,
+                        image_content_type,
+                        image_filename,
+                    )
+                ),
+                asyncio.create_task(
+                    run_stage(job, "generate_music", generate_and_save_music)
+                ),
+            ]
+            try:
+                image_url, audio_data = await asyncio.gather(*first_stages)
+            except Exception:
+                # The other stage runs in a worker thread that can't be stopped
+                # (and music is billed once started), so let it finish before
+                # the job is reported as failed
+                await asyncio.wait(first_stages)
+                raise
+
+            trimmed_audio = await run_stage(job, "trim_audio", trim_audio, audio_data)
+            audio_url = await run_stage(
+                job,
+                "upload_audio",
+                upload_to_fal,
+                trimmed_audio,
+                "audio/mpeg",
+                f"trimmed_{job.music_filename}",
+            )
+
+            render_stage = next(s for s in job.stages if s.name == "render_video")
+
+            def on_progress(message: str):
+                render_stage.detail = message
+
+            filename, video_url = await run_stage(
+                job, "render_video", render_video, image_url, audio_url, resolution, on_progress
+            )
+
+            job.filename = filename
+            job.file_url = f"/videos/{filename}"
+            job.video_url = video_url
+            job.status = "done"
+            logger.info(f"Package {job.job_id} done in {time.time() - job.created_at:.1f}s")
+
+        except Exception as e:
+            for stage in job.stages:
+                if stage.status == "pending":
+                    stage.status = "skipped"
+            job.status = "failed"
+            job.error = e.detail if isinstance(e, HTTPException) else str(e)
+            trace.get_current_span().set_status(StatusCode.ERROR, job.error)
+            logger.error(f"Package {job.job_id} failed: {job.error}")
+
+
+@app.post("/api/generate-package", response_model=PackageJob, status_code=202)
+async def generate_package(
+    image: UploadFile = FastAPIFile(...),
+    prompt: str = Form(...),
+    duration_seconds: int = Form(30),
+    resolution: str = Form("720p"),
+):
+    """
+    Generate a full birthday package (song + video) from a photo and a prompt.
+
+    The work runs in the background; poll /api/generate-package/{job_id} for
+    stage-level progress and the resulting music and video URLs.
+    
+    Args:
+        image: The photo to animate
+        prompt: Description of the song to generate
+        duration_seconds: Length of the song (default: 30, max: 120)
+        resolution: Video resolution (default: 720p)
+        
+    Returns:
+        The package job, with every stage pending or running
+    """
+    if not clients.elevenlabs_configured:
         raise HTTPException(
-            status_code=500,
-            detail=f"Video generation failed: {str(e)}"
+            status_code=503,
+            detail="Music generation is not available. ELEVENLABS_API_KEY is not configured."
         )
+    if not clients.fal_configured:
+        raise HTTPException(
+            status_code=503,
+            detail="Video generation is not available. FAL_KEY is not configured."
+        )
+
+    # Forget finished jobs nobody has polled for a while
+    now = time.time()
+    for job_id, old_job in list(package_jobs.items()):
+        if old_job.status != "running" and now - old_job.created_at > PACKAGE_JOB_TTL_SECONDS:
+            del package_jobs[job_id]
+
+    image_data = await image.read()
+
+    job = PackageJob(
+        job_id=uuid.uuid4().hex,
+        created_at=now,
+        stages=[PackageStage(name=name) for name in PACKAGE_STAGES],
+    )
+    package_jobs[job.job_id] = job
+
+    logger.info(f"Starting package {job.job_id}: {prompt} ({duration_seconds}s)")
+
+    task = asyncio.create_task(
+        run_package_pipeline(
+            job,
+            image_data,
+            image.content_type or "image/png",
+            image.filename or "photo.png",
+            prompt,
+            duration_seconds,
+            resolution,
+        )
+    )
+    package_tasks.add(task)
+    task.add_done_callback(package_tasks.discard)
+
+    return job
+
+
+@app.get("/api/generate-package/{job_id}", response_model=PackageJob)
+async def get_package(job_id: str):
+    """Return the progress of a birthday package job."""
+    job = package_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Package job not found: {job_id}")
+    return job
 
 
 @app.get("/api/list-videos")
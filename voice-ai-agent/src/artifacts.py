@@ -0,0 +1,260 @@
+"""
+Resolve audio URLs sent by the frontend to files on disk.
+
+Songs are served by this API server under /music/, but the frontend refers to
+them by whatever URL it used to reach us: a relative path, http://localhost:8000
+in development, or a public hostname in production. The resolver recognizes all
+of these (plus bare artifact ids such as "music_20250101_120000.mp3") and maps
+them straight to the file in the music directory, without any network I/O.
+
+Anything else is treated as remote audio and downloaded once into a local cache.
+Remote URLs come from clients, so the server only fetches http(s) URLs, and only
+connects to public addresses (see public_http.py), on every redirect too. That
+keeps requests from reaching loopback, private-network or cloud metadata
+endpoints.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
+
+logger = logging.getLogger("artifacts")
+
+# Prefix under which the API server serves generated music
+MUSIC_PATH_PREFIX = "/music/"
+
+# Comma-separated public base URLs of this server, e.g.
+# "https://birthdai.example.com,https://api.birthdai.example.com/v1"
+PUBLIC_BASE_URLS = [
+    url.strip() for url in os.getenv("PUBLIC_BASE_URLS", "").split(",") if url.strip()
+]
+
+# Remote audio is downloaded into this directory and reused for repeat requests
+DOWNLOAD_CACHE_DIR = Path("audio_cache")
+DOWNLOAD_CACHE_MAX_FILES = 50
+DOWNLOAD_TIMEOUT_SECONDS = 30
+# Songs are at most 120 seconds long; anything much larger isn't one of ours
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+MAX_DOWNLOAD_REDIRECTS = 3
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class ArtifactNotFoundError(Exception):
+    """The URL points at this server, but the artifact doesn't exist."""
+
+
+class RemoteAudioRejectedError(Exception):
+    """The URL is remote, but not one the server is allowed to fetch."""
+
+
+def check_remote_url(url: str) -> None:
+    """
+    Raise RemoteAudioRejectedError unless `url` is an http(s) URL with a host.
+
+    The host's addresses are checked when the connection is opened, not here,
+    so the address that was checked is the one connected to.
+    """
+    parsed = urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise RemoteAudioRejectedError(f"Unsupported audio URL: {url}")
+
+
+def _origin(scheme: str, netloc: str) -> tuple[str, Optional[int]]:
+    """Normalize host and port so http://Example.com:80 matches http://example.com."""
+    parsed = urlsplit(f"{scheme}://{netloc}")
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    return (parsed.hostname or "", port or _DEFAULT_PORTS.get(scheme))
+
+
+class ArtifactResolver:
+    """
+    Map audio URLs to local files.
+
+    Args:
+        music_dir: Directory the API server serves under /music/
+        base_urls: Public base URLs this server is reachable at
+        cache_dir: Where remote audio is downloaded to
+    """
+
+    def __init__(
+        self,
+        music_dir: Path,
+        base_urls: Iterable[str] = (),
+        cache_dir: Path = DOWNLOAD_CACHE_DIR,
+    ) -> None:
+        self.music_dir = music_dir
+        self.base_urls = list(base_urls)
+        self.cache_dir = cache_dir
+        self.local_hits = 0
+        self.cache_hits = 0
+        self.downloads = 0
+
+    def local_path(
+        self, url: str, extra_base_urls: Iterable[str] = ()
+    ) -> Optional[Path]:
+        """
+        Return the local file for a URL that points at this server.
+
+        Args:
+            url: Absolute URL, relative path or bare artifact id
+            extra_base_urls: Additional base URLs to treat as this server, such as
+                the one the current request came in on
+
+        Returns:
+            The file in the music directory, or None if the URL is remote
+
+        Raises:
+            ArtifactNotFoundError: If the URL points at this server but the file is missing
+        """
+        url = url.strip()
+        parsed = urlsplit(url)
+
+        if parsed.scheme in ("http", "https"):
+            path = None
+            origin = _origin(parsed.scheme, parsed.netloc)
+            for base_url in [*self.base_urls, *extra_base_urls]:
+                base = urlsplit(base_url)
+                if _origin(base.scheme, base.netloc) != origin:
+                    continue
+                base_path = base.path.rstrip("/")
+                if parsed.path.startswith(f"{base_path}/"):
+                    path = parsed.path[len(base_path) :]
+                    break
+            if path is None:
+                return None
+        elif parsed.scheme or parsed.netloc:
+            # Some other scheme, or a protocol-relative URL to another host
+            return None
+        elif parsed.path.startswith("/"):
+            path = parsed.path
+        else:
+            # Bare artifact id, as stored in the agent's room session
+            path = f"{MUSIC_PATH_PREFIX}{parsed.path}"
+
+        if not path.startswith(MUSIC_PATH_PREFIX):
+            return None
+
+        filename = path[len(MUSIC_PATH_PREFIX) :]
+        # Only files directly in the music directory are served
+        if (
+            not filename
+            or "/" in filename
+            or "\\" in filename
+            or filename.startswith(".")
+        ):
+            raise ArtifactNotFoundError(f"Audio file not found: {filename}")
+
+        local_path = self.music_dir / filename
+        if not local_path.is_file():
+            raise ArtifactNotFoundError(f"Audio file not found: {filename}")
+
+        self.local_hits += 1
+        return local_path
+
+    def resolve(self, url: str, extra_base_urls: Iterable[str] = ()) -> Path:
+        """
+        Return a local file holding the audio at `url`.
+
+        Our own artifacts are read in place; remote audio is downloaded into the
+        cache on first use.
+
+        Raises:
+            ArtifactNotFoundError: If the URL points at this server but the file is missing
+            RemoteAudioRejectedError: If the remote URL isn't one we may fetch
+            requests.RequestException: If remote audio can't be downloaded
+        """
+        local_path = self.local_path(url, extra_base_urls)
+        if local_path is not None:
+            return local_path
+        return self.download(url)
+
+    def download(self, url: str) -> Path:
+        """Download remote audio into the cache, reusing an earlier download."""
+        self.cache_dir.mkdir(exist_ok=True)
+
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        suffix = Path(urlsplit(url).path).suffix[:8] or ".mp3"
+        cached_path = self.cache_dir / f"{key}{suffix}"
+
+        if cached_path.exists():
+            self.cache_hits += 1
+            # Mark as recently used, so pruning drops the oldest downloads first
+            cached_path.touch()
+            return cached_path
+
+        logger.info(f"Downloading remote audio: {url}")
+        with self._get(url) as response:
+            # A unique name per call, so concurrent downloads of one URL don't collide
+            with tempfile.NamedTemporaryFile(
+                dir=self.cache_dir, prefix=f"{key}.", suffix=".part", delete=False
+            ) as f:
+                tmp_path = Path(f.name)
+            try:
+                size = 0
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        size += len(chunk)
+                        if size > MAX_DOWNLOAD_BYTES:
+                            raise RemoteAudioRejectedError(
+                                f"Remote audio is larger than {MAX_DOWNLOAD_BYTES} bytes"
+                            )
+                        f.write(chunk)
+                tmp_path.replace(cached_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+        self.downloads += 1
+        self._prune()
+        return cached_path
+
+    @contextmanager
+    def _get(self, url: str) -> Iterator:
+        """GET `url`, following redirects only to public http(s) hosts."""
+        import requests
+
+        from public_http import BlockedAddressError, public_session
+
+        with public_session() as session:
+            for _ in range(MAX_DOWNLOAD_REDIRECTS + 1):
+                check_remote_url(url)
+                try:
+                    response = session.get(
+                        url,
+                        stream=True,
+                        timeout=DOWNLOAD_TIMEOUT_SECONDS,
+                        allow_redirects=False,
+                    )
+                except BlockedAddressError as e:
+                    raise RemoteAudioRejectedError(str(e)) from e
+                with response:
+                    if not response.is_redirect:
+                        response.raise_for_status()
+                        yield response
+                        return
+                url = urljoin(url, response.headers["Location"])
+        raise requests.exceptions.TooManyRedirects(
+            f"More than {MAX_DOWNLOAD_REDIRECTS} redirects fetching remote audio"
+        )
+
+    def _prune(self) -> None:
+        files = sorted(
+            (
+                p
+                for p in self.cache_dir.iterdir()
+                if p.is_file() and p.suffix != ".part"
+            ),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for old_file in files[DOWNLOAD_CACHE_MAX_FILES:]:
+            old_file.unlink(missing_ok=True)
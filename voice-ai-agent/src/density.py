@@ -0,0 +1,206 @@
+"""
+Density mode for the agent worker.
+
+By default every room runs in its own job process, each with its own copy of the
+Silero VAD. With AGENT_DENSITY_MODE=1 the worker runs rooms as threads of a single
+process instead, and everything expensive is loaded once and shared:
+
+    - one Silero VAD model for all sessions
+    - one multilingual turn detector, served by an in-process inference thread
+      that runs requests from all rooms in arrival order
+    - one pair of noise-cancellation filters, picked per participant
+
+Each room reports the CPU time of its own event loop and the wall time spent on
+its turn-detector and VAD inference. Inference runs in native thread pools whose
+CPU can't be told apart per room, so these are not CPU figures; size the worker
+from the process CPU that tests/load_test.py measures.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from livekit import rtc
+from livekit.agents.inference_runner import _InferenceRunner
+from livekit.plugins import noise_cancellation, silero
+from livekit.plugins.turn_detector.base import EOUModelBase
+from livekit.plugins.turn_detector.multilingual import (
+    MultilingualModel,
+    _EUORunnerMultilingual,
+    _remote_inference_url,
+)
+
+logger = logging.getLogger("density")
+
+DENSITY_MODE = os.getenv("AGENT_DENSITY_MODE", "").lower() in ("1", "true", "yes")
+
+# Room that the current task is serving; inherited by every task the session spawns
+current_room: ContextVar[Optional[str]] = ContextVar("current_room", default=None)
+
+
+class SharedInferenceExecutor:
+    """
+    In-process inference executor shared by every room in the worker.
+
+    Requests from any event loop are queued to one inference thread, which runs
+    each as soon as it reaches the front of the queue. The turn-detector model
+    takes unpadded input, so requests aren't batched. Inference time and time
+    spent waiting in the queue are accounted per room.
+    """
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue = queue.Queue()
+        self._runners: dict[str, _InferenceRunner] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.inference_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.room_inference_seconds: dict[str, float] = defaultdict(float)
+        self._thread = threading.Thread(
+            target=self._run_forever, name="shared_inference", daemon=True
+        )
+        self._thread.start()
+
+    def load(self, method: str) -> None:
+        """Initialize a runner up front; raises if its model files are missing."""
+        self._get_runner(method)
+
+    def _get_runner(self, method: str) -> _InferenceRunner:
+        with self._lock:
+            runner = self._runners.get(method)
+            if runner is None:
+                runner = _InferenceRunner.registered_runners[method]()
+                runner.initialize()
+                self._runners[method] = runner
+            return runner
+
+    async def do_inference(self, method: str, data: bytes) -> Optional[bytes]:
+        fut: Future = Future()
+        self._queue.put((method, data, current_room.get(), time.perf_counter(), fut))
+        return await asyncio.wrap_future(fut)
+
+    def _run_forever(self) -> None:
+        while True:
+            method, data, room, queued_at, fut = self._queue.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+
+            start = time.perf_counter()
+            try:
+                result = self._get_runner(method).run(data)
+            except Exception as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(result)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.requests += 1
+                self.queue_wait_seconds += start - queued_at
+                self.inference_seconds += elapsed
+                self.room_inference_seconds[room or "unknown"] += elapsed
+
+
+class SharedTurnDetector(MultilingualModel):
+    """The multilingual turn detector, served by the shared in-process executor."""
+
+    def __init__(
+        self,
+        executor: SharedInferenceExecutor,
+        *,
+        unlikely_threshold: Optional[float] = None,
+    ) -> None:
+        # MultilingualModel.__init__ can't take an executor and falls back to the
+        # job context's, which doesn't exist in prewarm; this mirrors it otherwise.
+        # With LIVEKIT_REMOTE_EOT_URL set, predictions go to the remote endpoint
+        # and the per-language thresholds come from there too.
+        EOUModelBase.__init__(
+            self,
+            model_type="multilingual",
+            inference_executor=executor,
+            unlikely_threshold=unlikely_threshold,
+            load_languages=_remote_inference_url() is None,
+        )
+
+
+@dataclass
+class SharedModels:
+    vad: silero.VAD
+    inference_executor: SharedInferenceExecutor
+    turn_detector: SharedTurnDetector
+    bvc: noise_cancellation.BVC
+    bvc_telephony: noise_cancellation.BVCTelephony
+
+    def noise_cancellation(self, params):
+        """Pick the shared telephony or standard filter for a participant."""
+        if params.participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP:
+            return self.bvc_telephony
+        return self.bvc
+
+
+_shared_models: Optional[SharedModels] = None
+_shared_models_lock = threading.Lock()
+
+
+def shared_models() -> SharedModels:
+    """Load the process-wide models on first use and return them."""
+    global _shared_models
+
+    with _shared_models_lock:
+        if _shared_models is None:
+            executor = SharedInferenceExecutor()
+            if _remote_inference_url() is None:
+                executor.load(_EUORunnerMultilingual.INFERENCE_METHOD)
+            _shared_models = SharedModels(
+                vad=silero.VAD.load(),
+                inference_executor=executor,
+                turn_detector=SharedTurnDetector(executor),
+                bvc=noise_cancellation.BVC(),
+                bvc_telephony=noise_cancellation.BVCTelephony(),
+            )
+            logger.info("Loaded shared models for density mode")
+
+        return _shared_models
+
+
+class RoomUsage:
+    """
+    Resources used on behalf of one room.
+
+    Event-loop CPU is measured on the room's own thread. Turn-detector time
+    comes from the shared executor and VAD time from the session's metrics;
+    both are wall time spent in inference, not CPU.
+    """
+
+    def __init__(
+        self, room_name: str, executor: Optional[SharedInferenceExecutor] = None
+    ) -> None:
+        self.room_name = room_name
+        self.executor = executor
+        self.vad_seconds = 0.0
+        self._started_at = time.perf_counter()
+        self._loop_cpu_start = time.thread_time()
+
+    def report(self) -> dict:
+        elapsed = max(time.perf_counter() - self._started_at, 1e-6)
+        loop_cpu = time.thread_time() - self._loop_cpu_start
+        turn_detector_seconds = (
+            self.executor.room_inference_seconds.get(self.room_name, 0.0)
+            if self.executor is not None
+            else 0.0
+        )
+        return {
+            "room": self.room_name,
+            "elapsed_seconds": elapsed,
+            "loop_cpu_seconds": loop_cpu,
+            "loop_cpu_share": loop_cpu / elapsed,
+            "turn_detector_wall_seconds": turn_detector_seconds,
+            "vad_wall_seconds": self.vad_seconds,
+        }
@@ -0,0 +1,111 @@
+"""
+HTTP session that only connects to public addresses.
+
+Used to fetch URLs supplied by clients. Checking a URL's host up front isn't
+enough: the HTTP library would look the host up again when it connects, and a
+hostile DNS server can answer with a public address the first time and a
+loopback or metadata address (169.254.169.254) the second. Here the address is
+resolved once, when the connection is opened, and the socket is connected to
+exactly the address that passed the check. TLS still verifies the certificate
+against the original hostname.
+
+Importing this module loads requests and urllib3, so callers import it lazily.
+"""
+
+import ipaddress
+import socket
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import create_connection
+
+
+class BlockedAddressError(Exception):
+    """The host resolves to an address the server must not connect to."""
+
+
+def is_public_ip(address: str) -> bool:
+    """Whether an IP address is publicly routable."""
+    return ipaddress.ip_address(address.split("%")[0]).is_global
+
+
+def public_address(host: str, port: int) -> str:
+    """
+    Resolve `host` and return an address to connect to.
+
+    Raises:
+        BlockedAddressError: If the host doesn't resolve, or any of its
+            addresses is loopback, private, link-local or otherwise internal
+    """
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise BlockedAddressError(f"Could not resolve {host}: {e}") from e
+
+    addresses = [info[4][0] for info in infos]
+    if not addresses or not all(is_public_ip(address) for address in addresses):
+        raise BlockedAddressError(f"{host} is not a publicly reachable host")
+    return addresses[0]
+
+
+class _PublicAddressMixin:
+    """Connect to the checked address instead of resolving the host again."""
+
+    def _new_conn(self) -> socket.socket:
+        address = public_address(self._dns_host, self.port)
+        try:
+            return create_connection(
+                (address, self.port),
+                self.timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options,
+            )
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self,
+                f"Connection to {self.host} timed out. (connect timeout={self.timeout})",
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(
+                self, f"Failed to establish a new connection: {e}"
+            ) from e
+
+
+class _PublicHTTPConnection(_PublicAddressMixin, HTTPConnection):
+    pass
+
+
+class _PublicHTTPSConnection(_PublicAddressMixin, HTTPSConnection):
+    pass
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+
+class PublicOnlyAdapter(HTTPAdapter):
+    """Transport adapter whose connections only reach public addresses."""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _PublicHTTPConnectionPool,
+            "https": _PublicHTTPSConnectionPool,
+        }
+
+
+def public_session() -> Session:
+    """A requests session that refuses to connect to internal addresses."""
+    session = Session()
+    # A proxy from the environment would be connected to instead of the host
+    session.trust_env = False
+    session.mount("http://", PublicOnlyAdapter())
+    session.mount("https://", PublicOnlyAdapter())
+    return session
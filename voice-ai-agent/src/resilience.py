@@ -0,0 +1,407 @@
+"""
+Circuit breakers, retries and hedged calls for upstream services.
+
+Each upstream (ElevenLabs, fal.ai) gets an Upstream with its own circuit breaker
+and metrics. When an upstream keeps failing, the breaker opens and further calls
+fail immediately instead of each waiting for its own timeout, which would tie up
+worker threads and add load to a service that is already struggling. After
+`reset_timeout` seconds a single probe call is let through; if it succeeds the
+breaker closes again.
+
+Calls are blocking and meant to run in worker threads. Transient failures
+(connection errors, timeouts, 429 and 5xx responses) are retried with full jitter
+within an overall Deadline; other errors, including local faults such as a full
+disk or a bug in our own code, are raised straight away and don't count against
+the breaker.
+"""
+
+import contextvars
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from opentelemetry import trace
+
+from tracing import tracer
+
+logger = logging.getLogger("resilience")
+
+# Latency samples kept per upstream for the p50/p95 report
+MAX_LATENCY_SAMPLES = 500
+
+# Hedged calls in flight across the process. Hedges beyond this are skipped
+# rather than queued, so a slow upstream never gets more than this much extra load.
+MAX_CONCURRENT_HEDGES = 8
+
+# Threads that run hedged calls; a losing call finishes in the background
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_HEDGES, thread_name_prefix="hedge"
+)
+_hedge_slots = threading.BoundedSemaphore(MAX_CONCURRENT_HEDGES)
+
+
+class CircuitOpenError(Exception):
+    """The upstream's circuit breaker is open, so the call was not attempted."""
+
+    def __init__(self, upstream: str, retry_after: float) -> None:
+        super().__init__(
+            f"{upstream} is unavailable after repeated failures; "
+            f"retry in {retry_after:.0f}s"
+        )
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class UpstreamTimeoutError(Exception):
+    """The time budget for an upstream operation ran out."""
+
+
+class Deadline:
+    """Overall time budget shared by the attempts and polls of one operation."""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.seconds = seconds
+        self._clock = clock
+        self._expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - self._clock())
+
+    def check(self, what: str) -> None:
+        """Raise UpstreamTimeoutError if the budget is spent."""
+        if self.remaining() <= 0:
+            raise UpstreamTimeoutError(f"{what} timed out after {self.seconds:.0f}s")
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """HTTP status code carried by an SDK or requests exception, if any."""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def _transport_errors() -> tuple[type[BaseException], ...]:
+    """Exception types for failures to reach an upstream or to hear back from it."""
+    errors: list[type[BaseException]] = [
+        UpstreamTimeoutError,
+        TimeoutError,
+        ConnectionError,
+    ]
+    # Only check the HTTP libraries that are already loaded, so importing this
+    # module doesn't pull them in at startup
+    if "requests" in sys.modules:
+        requests = sys.modules["requests"]
+        errors += [requests.ConnectionError, requests.Timeout]
+    if "httpx" in sys.modules:
+        errors.append(sys.modules["httpx"].TransportError)
+    return tuple(errors)
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failure is worth retrying and counts against the breaker.
+
+    Only transport failures and 429/5xx responses are; anything else (a 4xx,
+    an OSError writing a file, a bug in our own code) is not the upstream's fault.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status_code = status_code_of(error)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, _transport_errors())
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+
+    Args:
+        name: Upstream name, used in errors and logs
+        failure_threshold: Consecutive transient failures that open the breaker
+        reset_timeout: Seconds to stay open before letting a probe call through
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through right now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_after = max(
+                0.0, self.reset_timeout - (self._clock() - self._opened_at)
+            )
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Circuit for {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """End a call that says nothing about the upstream's health, e.g. a local error."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or (
+                self._opened_at is None and self._failures >= self.failure_threshold
+            ):
+                logger.warning(
+                    f"Circuit for {self.name} opened after "
+                    f"{self._failures} consecutive failures"
+                )
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+
+class Upstream:
+    """
+    Circuit breaker, retries, hedging and metrics for one upstream service.
+
+    Args:
+        name: Upstream name, as reported in metrics
+        failure_threshold: Consecutive transient failures that open the breaker
+        reset_timeout: Seconds the breaker stays open before a probe call
+        base_delay: First retry backoff, doubled on each attempt
+        max_delay: Upper bound on a single retry backoff
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        base_delay: float = 0.5,
+        max_delay: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout, clock)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=MAX_LATENCY_SAMPLES)
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "retries": 0,
+            "short_circuited": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "hedges_skipped": 0,
+        }
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+
+    def _attempt(self, func: Callable, *args, **kwargs):
+        """Make one call through the breaker, recording its outcome."""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("short_circuited")
+            raise
+
+        self._count("calls")
+        start = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(
+                f"{self.name}.{getattr(func, '__name__', 'call')}",
+                attributes={"upstream": self.name},
+            ):
+                result = func(*args, **kwargs)
+        except Exception as e:
+            if isinstance(e, UpstreamTimeoutError):
+                self._count("timeouts")
+            self._count("failures")
+            if is_transient(e):
+                self.breaker.record_failure()
+            elif status_code_of(e) is not None:
+                # The upstream answered; the request itself was bad
+                self.breaker.record_success()
+            else:
+                # A local fault (a full disk, a bug in our code): the upstream
+                # may not have been reached, so neither close nor open the breaker
+                self.breaker.release_probe()
+            raise
+
+        with self._lock:
+            self.counters["successes"] += 1
+            self._latencies.append(time.perf_counter() - start)
+        self.breaker.record_success()
+        return result
+
+    def call(
+        self,
+        func: Callable,
+        *args,
+        attempts: int = 1,
+        deadline: Optional[Deadline] = None,
+        hedge_after: Optional[float] = None,
+        **kwargs,
+    ):
+        """
+        Call `func`, retrying transient failures with jittered backoff.
+
+        Args:
+            func: Blocking function that talks to the upstream
+            attempts: Maximum number of attempts, including the first
+            deadline: Overall time budget; no attempt or backoff starts past it
+            hedge_after: If set, start a second identical call when the first
+                hasn't returned after this many seconds and use whichever
+                finishes first. Only for idempotent reads such as status polls.
+
+        Returns:
+            Whatever `func` returns
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            UpstreamTimeoutError: If the deadline runs out
+        """
+        for attempt in range(attempts):
+            if deadline is not None and deadline.remaining() <= 0:
+                self._count("timeouts")
+                deadline.check(f"{self.name} request")
+
+            try:
+                if hedge_after is None:
+                    return self._attempt(func, *args, **kwargs)
+                return self._hedged(func, hedge_after, *args, **kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if attempt == attempts - 1 or not is_transient(e):
+                    raise
+
+                # Full jitter keeps retries from many workers from arriving together
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2**attempt)
+                )
+                if deadline is not None and delay >= deadline.remaining():
+                    raise
+                logger.warning(
+                    f"{self.name} call failed ({e}), retry {attempt + 1} "
+                    f"in {delay:.2f}s"
+                )
+                self._count("retries")
+                trace.get_current_span().add_event(
+                    "retry", {"upstream": self.name, "delay_seconds": delay}
+                )
+                time.sleep(delay)
+
+    def _hedged(self, func: Callable, hedge_after: float, *args, **kwargs):
+        # The primary call gets its own thread rather than a pool slot, so it
+        # starts straight away however many polls are in flight; only the hedge
+        # uses the shared pool. Each call runs in a copy of the caller's context,
+        # so its span has the caller's span as parent.
+        primary: Future = Future()
+
+        def run_primary() -> None:
+            try:
+                primary.set_result(self._attempt(func, *args, **kwargs))
+            except BaseException as e:
+                primary.set_exception(e)
+
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(run_primary,),
+            name=f"{self.name}_call",
+            daemon=True,
+        ).start()
+
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        if self.breaker.state != "closed":
+            # Don't add load to an upstream the breaker is protecting
+            return primary.result()
+        if not _hedge_slots.acquire(blocking=False):
+            # Every hedge thread is busy, which means the upstream is slow for
+            # everyone; a queued hedge would only double the load
+            self._count("hedges_skipped")
+            return primary.result()
+
+        self._count("hedges")
+        trace.get_current_span().add_event("hedge", {"upstream": self.name})
+        hedge = _hedge_executor.submit(
+            contextvars.copy_context().run, self._attempt, func, *args, **kwargs
+        )
+        hedge.add_done_callback(lambda _: _hedge_slots.release())
+
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def snapshot(self) -> dict:
+        """Counters, latency percentiles and breaker state, for /metrics."""
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 3)
+
+        return {
+            "state": self.breaker.state,
+            **counters,
+            "p50_seconds": percentile(0.5),
+            "p95_seconds": percentile(0.95),
+        }
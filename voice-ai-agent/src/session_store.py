@@ -0,0 +1,280 @@
+import json
+import logging
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from livekit.agents import llm
+
+logger = logging.getLogger("session_store")
+
+# Keep at most this many chat items (messages, tool calls, tool outputs) in the
+# context sent to the LLM. Once it grows past that, it is cut back to the most
+# recent COMPACT_TO_ITEMS and the older turns are folded into the summary.
+# Compacting in batches means the context only changes every few turns, so a
+# reply generated preemptively from it can still be used.
+MAX_CHAT_ITEMS = 16
+COMPACT_TO_ITEMS = 8
+
+# The first things the user says (usually the friend's name and the occasion) are
+# kept for the whole call, up to this many characters.
+MAX_PINNED_CHARS = 400
+
+# Upper bound on the rolling summary of what the user said after that, in characters.
+MAX_SUMMARY_CHARS = 800
+
+# Only the most recent turns are kept for the tokens/latency report.
+MAX_TURN_STATS = 500
+
+# Stored sessions hold what the user said about their friend, so they are only
+# kept long enough for a reconnect, and never more than this many rooms.
+SESSION_TTL_SECONDS = 24 * 60 * 60
+MAX_SESSION_FILES = 100
+
+
+def compact_chat_ctx(
+    chat_ctx: llm.ChatContext,
+    max_items: int = MAX_CHAT_ITEMS,
+    keep_items: int = COMPACT_TO_ITEMS,
+) -> list[str]:
+    """
+    Truncate a chat context in place to its most recent items once it is too long.
+
+    Args:
+        chat_ctx: The chat context to compact
+        max_items: Leave the context alone until it has more items than this
+        keep_items: Number of items to keep when it is truncated
+
+    Returns:
+        The text of the user messages that were dropped, oldest first, so the
+        caller can fold them into a rolling summary
+    """
+    if len(chat_ctx.items) <= max_items:
+        return []
+
+    before = list(chat_ctx.items)
+    chat_ctx.truncate(max_items=keep_items)
+    kept_ids = {item.id for item in chat_ctx.items}
+
+    return [
+        item.text_content
+        for item in before
+        if item.id not in kept_ids
+        and item.type == "message"
+        and item.role == "user"
+        and item.text_content
+    ]
+
+
+def _clip_end(text: str, max_chars: int) -> str:
+    """Cut text to at most max_chars, without ending in the middle of a word."""
+    if len(text) <= max_chars:
+        return text
+    return text[: max_chars + 1].rsplit(" ", 1)[0][:max_chars]
+
+
+@dataclass
+class TurnStats:
+    """Prompt size and LLM latency for one agent turn."""
+
+    prompt_tokens: int
+    completion_tokens: int
+    ttft: float
+    duration: float
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class RoomSession:
+    """Conversation and artifact state for one LiveKit room."""
+
+    room_name: str
+    pinned_summary: str = ""
+    summary: str = ""
+    artifact_ids: list[str] = field(default_factory=list)
+    chat_items: list[dict] = field(default_factory=list)
+    turn_stats: list[TurnStats] = field(default_factory=list)
+    updated_at: float = field(default_factory=time.time)
+
+    def remember(self, text: str) -> None:
+        """
+        Fold a user statement that left the chat window into the summary.
+
+        The first statements are pinned; later ones go into a rolling summary
+        that drops its oldest text first.
+        """
+        text = " ".join(text.split())
+        if not text:
+            return
+
+        if not self.pinned_summary:
+            self.pinned_summary = _clip_end(text, MAX_PINNED_CHARS)
+        elif len(self.pinned_summary) + 1 + len(text) <= MAX_PINNED_CHARS:
+            self.pinned_summary = f"{self.pinned_summary} {text}"
+        else:
+            summary = f"{self.summary} {text}".strip()
+            if len(summary) > MAX_SUMMARY_CHARS:
+                summary = summary[-MAX_SUMMARY_CHARS:]
+                # Don't start the summary in the middle of a word
+                summary = summary.split(" ", 1)[-1]
+            self.summary = summary
+        self.updated_at = time.time()
+
+    def recall(self) -> str:
+        """Everything remembered from earlier in the call, oldest first."""
+        if self.pinned_summary and self.summary:
+            return f"{self.pinned_summary} ... {self.summary}"
+        return self.pinned_summary or self.summary
+
+    def add_artifact(self, artifact_id: str) -> None:
+        """Link a generated file (e.g. a music track) to this room."""
+        if artifact_id not in self.artifact_ids:
+            self.artifact_ids.append(artifact_id)
+        self.updated_at = time.time()
+
+    def save_chat_ctx(self, chat_ctx: llm.ChatContext) -> None:
+        """Store a compacted copy of the chat context, without instructions."""
+        compacted = chat_ctx.copy(exclude_instructions=True, exclude_empty_message=True)
+        compacted.truncate(max_items=MAX_CHAT_ITEMS)
+        self.chat_items = compacted.to_dict()["items"]
+        self.updated_at = time.time()
+
+    def load_chat_ctx(self) -> llm.ChatContext:
+        """Rebuild the stored chat context, or an empty one if it can't be parsed."""
+        try:
+            return llm.ChatContext.from_dict({"items": self.chat_items})
+        except Exception as e:
+            logger.warning(f"Discarding stored chat context for {self.room_name}: {e}")
+            return llm.ChatContext.empty()
+
+    def record_turn(
+        self, prompt_tokens: int, completion_tokens: int, ttft: float, duration: float
+    ) -> None:
+        """Record prompt size and LLM latency for one turn."""
+        self.turn_stats.append(
+            TurnStats(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                ttft=ttft,
+                duration=duration,
+            )
+        )
+        del self.turn_stats[:-MAX_TURN_STATS]
+
+    def stats(self) -> dict:
+        """Summarize tokens-per-turn and LLM latency over the recorded turns."""
+        if not self.turn_stats:
+            return {"turns": 0}
+
+        prompt_tokens = sorted(t.prompt_tokens for t in self.turn_stats)
+        ttfts = sorted(t.ttft for t in self.turn_stats if t.ttft >= 0)
+
+        def p95(values: list) -> float:
+            return (
+                values[min(len(values) - 1, int(len(values) * 0.95))] if values else 0
+            )
+
+        return {
+            "turns": len(self.turn_stats),
+            "avg_prompt_tokens": sum(prompt_tokens) / len(prompt_tokens),
+            "max_prompt_tokens": prompt_tokens[-1],
+            "avg_ttft": sum(ttfts) / len(ttfts) if ttfts else 0,
+            "p95_ttft": p95(ttfts),
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RoomSession":
+        data = dict(data)
+        data["turn_stats"] = [TurnStats(**t) for t in data.get("turn_stats", [])]
+        return cls(**data)
+
+
+class SessionStore:
+    """
+    Per-room session state, keyed by the LiveKit room name.
+
+    Sessions are kept in memory and, when a directory is given, persisted as one
+    JSON file per room so a reconnect to the same room picks up where it left off.
+    Files older than `ttl` seconds are deleted, as are all but the newest
+    `max_files`.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        ttl: float = SESSION_TTL_SECONDS,
+        max_files: int = MAX_SESSION_FILES,
+    ) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_files = max_files
+        self._sessions: dict[str, RoomSession] = {}
+        if self.directory is not None:
+            self.directory.mkdir(exist_ok=True)
+            self._prune()
+
+    def _path(self, room_name: str) -> Path:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", room_name)
+        return self.directory / f"{safe_name}.json"
+
+    def get(self, room_name: str) -> RoomSession:
+        """Return the session for a room, loading or creating it as needed."""
+        session = self._sessions.get(room_name)
+        if session is not None:
+            return session
+
+        path = self._path(room_name) if self.directory is not None else None
+        if path is not None and path.exists():
+            if self._expired(path):
+                path.unlink(missing_ok=True)
+            else:
+                try:
+                    with open(path) as f:
+                        session = RoomSession.from_dict(json.load(f))
+                except (OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Could not load session for {room_name}: {e}")
+
+        if session is None:
+            session = RoomSession(room_name=room_name)
+
+        self._sessions[room_name] = session
+        return session
+
+    def release(self, room_name: str) -> None:
+        """Persist a room session and drop it from memory once the room has ended."""
+        session = self._sessions.pop(room_name, None)
+        if session is not None:
+            self._write(session)
+            self._prune()
+
+    def _write(self, session: RoomSession) -> None:
+        if self.directory is None:
+            return
+
+        path = self._path(session.room_name)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(session.to_dict(), f)
+        tmp_path.replace(path)
+
+    def _expired(self, path: Path) -> bool:
+        try:
+            return time.time() - path.stat().st_mtime > self.ttl
+        except OSError:
+            return True
+
+    def _prune(self) -> None:
+        """Delete expired session files and all but the newest max_files."""
+        files = sorted(
+            self.directory.glob("*.json"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for index, path in enumerate(files):
+            if index >= self.max_files or self._expired(path):
+                path.unlink(missing_ok=True)
@@ -0,0 +1,239 @@
+"""
+OpenTelemetry tracing for the birthday flow.
+
+One user's flow touches several processes: the token request, the agent's
+generate_music tool in the LiveKit worker, and the later music or video render in
+the API server. They are stitched together through the LiveKit room name. The
+trace id is derived from the room name, so any span started under room_context()
+joins the room's trace with no other coordination. That includes agent jobs
+(from ctx.log_context_fields["room"]) and API requests carrying an X-Room-Name
+header.
+
+Those spans are children of a room root span whose ids are also derived from the
+room name. The API server records that root span once per room when it issues
+the room's LiveKit token (record_room_root()), so trace backends see a complete
+tree. A room joined without a token from this server (e.g. from the LiveKit
+playground) has no root span, and backends show its spans under a missing parent.
+
+Tracing is off unless an exporter is configured:
+
+    OTEL_EXPORTER_OTLP_ENDPOINT   send spans to an OTLP/HTTP collector,
+                                  e.g. http://localhost:4318
+    TRACES_FILE                   append spans to a JSON-lines file
+
+Without either, spans are no-ops and cost next to nothing.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from contextvars import ContextVar
+from typing import Optional
+
+from opentelemetry import context, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.id_generator import RandomIdGenerator
+from opentelemetry.trace import (
+    NonRecordingSpan,
+    SpanContext,
+    TraceFlags,
+    format_span_id,
+    format_trace_id,
+)
+
+logger = logging.getLogger("tracing")
+
+# Header the frontend uses to tie API requests to the LiveKit room
+ROOM_HEADER = "X-Room-Name"
+
+# Span attribute holding the room name
+ROOM_ATTRIBUTE = "birthdai.room"
+
+tracer = trace.get_tracer("birthdai")
+
+# Rooms whose root span this process has recorded, oldest first
+MAX_RECORDED_ROOMS = 1000
+
+_provider = None
+_setup_lock = threading.Lock()
+
+# Trace and span id for the span being started by record_room_root()
+_forced_ids: ContextVar[Optional[tuple[int, int]]] = ContextVar(
+    "_forced_ids", default=None
+)
+_recorded_rooms: OrderedDict[str, None] = OrderedDict()
+_recorded_rooms_lock = threading.Lock()
+
+
+def room_trace_id(room_name: str) -> int:
+    """Deterministic 128-bit trace id for a LiveKit room."""
+    return int.from_bytes(hashlib.sha256(room_name.encode()).digest()[:16], "big")
+
+
+def room_root_span_id(room_name: str) -> int:
+    """Deterministic 64-bit span id of a room's root span."""
+    digest = hashlib.sha256(f"{room_name}/root".encode()).digest()
+    return int.from_bytes(digest[:8], "big") or 1
+
+
+def room_context(room_name: str) -> context.Context:
+    """
+    OpenTelemetry context whose parent is the room's (remote) root span.
+
+    Spans started in this context are children of the room's trace, wherever
+    they are recorded.
+    """
+    parent = SpanContext(
+        trace_id=room_trace_id(room_name),
+        span_id=room_root_span_id(room_name),
+        is_remote=True,
+        trace_flags=TraceFlags(TraceFlags.SAMPLED),
+    )
+    return trace.set_span_in_context(NonRecordingSpan(parent))
+
+
+class RoomIdGenerator(RandomIdGenerator):
+    """Random ids, except for room root spans, which get the room's fixed ids."""
+
+    def generate_trace_id(self) -> int:
+        forced = _forced_ids.get()
+        return forced[0] if forced else super().generate_trace_id()
+
+    def generate_span_id(self) -> int:
+        forced = _forced_ids.get()
+        return forced[1] if forced else super().generate_span_id()
+
+
+def record_room_root(room_name: str) -> None:
+    """
+    Record the root span of a room's trace, once per room in this process.
+
+    Needs a tracer provider using RoomIdGenerator, as setup_tracing() installs.
+    """
+    with _recorded_rooms_lock:
+        if room_name in _recorded_rooms:
+            return
+        _recorded_rooms[room_name] = None
+        while len(_recorded_rooms) > MAX_RECORDED_ROOMS:
+            _recorded_rooms.popitem(last=False)
+
+    token = _forced_ids.set((room_trace_id(room_name), room_root_span_id(room_name)))
+    try:
+        span = tracer.start_span(
+            "livekit_room",
+            context=context.Context(),
+            attributes={ROOM_ATTRIBUTE: room_name},
+        )
+    finally:
+        _forced_ids.reset(token)
+    span.end()
+
+
+def setup_tracing(service_name: str) -> Optional[TracerProvider]:
+    """
+    Install a tracer provider for this process if an exporter is configured.
+
+    Safe to call more than once (e.g. from every prewarm); only the first call
+    has an effect.
+
+    Returns:
+        The SDK tracer provider, or None if tracing is disabled
+    """
+    global _provider
+
+    with _setup_lock:
+        if _provider is not None:
+            return _provider
+
+        otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv(
+            "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"
+        )
+        traces_file = os.getenv("TRACES_FILE")
+        if not otlp_endpoint and not traces_file:
+            return None
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": service_name}),
+            id_generator=RoomIdGenerator(),
+        )
+
+        if otlp_endpoint:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                OTLPSpanExporter,
+            )
+
+            # The exporter reads the endpoint and headers from the OTEL_* variables
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            logger.info(f"Exporting traces to {otlp_endpoint}")
+
+        if traces_file:
+            provider.add_span_processor(
+                BatchSpanProcessor(JsonLinesSpanExporter(traces_file))
+            )
+            logger.info(f"Writing traces to {traces_file}")
+
+        trace.set_tracer_provider(provider)
+        _provider = provider
+        return provider
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the exporters, if tracing was set up."""
+    with _setup_lock:
+        if _provider is not None:
+            _provider.shutdown()
+
+
+def _span_to_dict(span: ReadableSpan) -> dict:
+    parent = span.parent
+    return {
+        "name": span.name,
+        "trace_id": format_trace_id(span.context.trace_id),
+        "span_id": format_span_id(span.context.span_id),
+        "parent_id": format_span_id(parent.span_id) if parent else None,
+        "service": span.resource.attributes.get("service.name"),
+        "start_time": span.start_time / 1e9,
+        "duration_ms": (span.end_time - span.start_time) / 1e6,
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+        "events": [
+            {"name": event.name, "attributes": dict(event.attributes or {})}
+            for event in span.events
+        ],
+    }
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Append finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(_span_to_dict(span)) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning(f"Could not write traces to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+
+def current_trace_id() -> Optional[str]:
+    """Hex trace id of the current span, for log lines and responses."""
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid:
+        return None
+    return format_trace_id(span_context.trace_id)
@@ -0,0 +1,162 @@
+"""
+Upstream clients for the API server, created on first use.
+
+Importing the ElevenLabs, fal.ai and LiveKit SDKs (and pydub) takes longer than
+starting FastAPI itself, so api_server doesn't import any of them at module load.
+The registry below reads the configuration up front, loads each client the first
+time a request needs it, and is started and closed by the app's lifespan. After
+startup the clients are also warmed in a background thread, so the first real
+request usually finds them ready without delaying readiness.
+"""
+
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Optional
+
+logger = logging.getLogger("upstreams")
+
+# Modules imported by warm(), in the order the requests are most likely to need them
+WARM_MODULES = ["fal_client", "elevenlabs.client", "livekit.api", "pydub", "requests"]
+
+# Per-request timeouts for the upstream SDKs (the SDK defaults are 240s and 120s);
+# overall budgets for whole operations live in api_server
+ELEVENLABS_TIMEOUT_SECONDS = 60
+FAL_TIMEOUT_SECONDS = 30
+
+
+class UpstreamClients:
+    """
+    Lazily-initialized upstream clients shared by all requests.
+
+    Args:
+        directories: Directories to create when the server starts
+    """
+
+    def __init__(self, directories: tuple[Path, ...] = ()) -> None:
+        self.directories = directories
+        self.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
+        self.fal_api_key = os.getenv("FAL_KEY")
+        self.livekit_url = os.getenv("LIVEKIT_URL")
+        self.livekit_api_key = os.getenv("LIVEKIT_API_KEY")
+        self.livekit_api_secret = os.getenv("LIVEKIT_API_SECRET")
+
+        self.started_at: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+        self._elevenlabs: Optional[Any] = None
+        self._fal: Optional[Any] = None
+        self._lock = threading.Lock()
+        self._warm_thread: Optional[threading.Thread] = None
+
+    @property
+    def elevenlabs_configured(self) -> bool:
+        return bool(self.elevenlabs_api_key)
+
+    @property
+    def fal_configured(self) -> bool:
+        return bool(self.fal_api_key)
+
+    @property
+    def livekit_configured(self) -> bool:
+        return all([self.livekit_url, self.livekit_api_key, self.livekit_api_secret])
+
+    @property
+    def ready(self) -> bool:
+        return self.started_at is not None
+
+    def start(self) -> None:
+        """Create the working directories and report missing configuration."""
+        start = time.perf_counter()
+
+        for directory in self.directories:
+            directory.mkdir(exist_ok=True)
+
+        if not self.elevenlabs_configured:
+            logger.warning(
+                "ELEVENLABS_API_KEY not found. Music generation will not be available."
+            )
+        if not self.fal_configured:
+            logger.warning("FAL_KEY not found. Video generation will not be available.")
+        if not self.livekit_configured:
+            logger.warning(
+                "LiveKit credentials not found. Voice agent features will not be available."
+            )
+
+        self.started_at = time.time()
+        self.startup_seconds = time.perf_counter() - start
+
+    def warm(self) -> None:
+        """Import the upstream SDKs in a background thread."""
+        if self._warm_thread is not None:
+            return
+
+        def run() -> None:
+            start = time.perf_counter()
+            for name in WARM_MODULES:
+                try:
+                    importlib.import_module(name)
+                except Exception as e:
+                    logger.warning(f"Could not preload {name}: {e}")
+            logger.info(
+                f"Upstream clients warmed in {time.perf_counter() - start:.2f}s"
+            )
+
+        self._warm_thread = threading.Thread(
+            target=run, name="warm_upstreams", daemon=True
+        )
+        self._warm_thread.start()
+
+    def close(self) -> None:
+        """Release the clients; they are created again if the app restarts."""
+        with self._lock:
+            self._elevenlabs = None
+            self._fal = None
+        self.started_at = None
+
+    @property
+    def elevenlabs(self):
+        """The ElevenLabs client, or None if ELEVENLABS_API_KEY isn't set."""
+        if not self.elevenlabs_configured:
+            return None
+
+        with self._lock:
+            if self._elevenlabs is None:
+                from elevenlabs.client import ElevenLabs
+
+                self._elevenlabs = ElevenLabs(
+                    api_key=self.elevenlabs_api_key, timeout=ELEVENLABS_TIMEOUT_SECONDS
+                )
+            return self._elevenlabs
+
+    @property
+    def fal(self):
+        """The fal.ai client, with a per-request timeout."""
+        with self._lock:
+            if self._fal is None:
+                import fal_client
+
+                self._fal = fal_client.SyncClient(
+                    key=self.fal_api_key, default_timeout=FAL_TIMEOUT_SECONDS
+                )
+            return self._fal
+
+    @property
+    def livekit_api(self) -> ModuleType:
+        """The livekit.api module, used to mint access tokens."""
+        from livekit import api
+
+        return api
+
+    def status(self) -> dict:
+        """Configuration and load state of every upstream, for the readiness probe."""
+        return {
+            "elevenlabs_configured": self.elevenlabs_configured,
+            "fal_configured": self.fal_configured,
+            "livekit_configured": self.livekit_configured,
+            "loaded": [name for name in WARM_MODULES if name in sys.modules],
+        }
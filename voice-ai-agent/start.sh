@@ -5,8 +5,13 @@ echo "Starting API server on port 8000..."
 uv run python src/api_server.py &
 API_PID=$!
 
-# Wait a moment for the API server to start
-sleep 2
+# Wait until the API server reports ready (up to 30 seconds)
+for _ in $(seq 1 300); do
+    if python3 -c "import urllib.request; urllib.request.urlopen('http://localhost:8000/readyz', timeout=1)" 2>/dev/null; then
+        break
+    fi
+    sleep 0.1
+done
 
 # Start the LiveKit agent
 echo "Starting LiveKit agent..."
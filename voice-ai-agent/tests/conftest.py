@@ -0,0 +1,38 @@
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from tracing import RoomIdGenerator
+
+
+@pytest.fixture(scope="session")
+def _span_exporter() -> InMemorySpanExporter:
+    # The global tracer provider can only be set once per process
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(id_generator=RoomIdGenerator())
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return exporter
+
+
+@pytest.fixture
+def spans(_span_exporter) -> InMemorySpanExporter:
+    """Finished spans recorded during the test."""
+    _span_exporter.clear()
+    return _span_exporter
+
+
+@pytest.fixture(scope="session")
+def bench_models():
+    """Shared benchmark models, with the multilingual turn detector loaded."""
+    from pipeline_bench import load_models
+
+    models = load_models()
+    if models.turn_detector is None:
+        pytest.skip(
+            "turn-detector weights are not downloaded "
+            "(run `uv run src/agent.py download-files`)"
+        )
+    return models
@@ -0,0 +1,232 @@
+"""Local STT/LLM/TTS stand-ins so the voice pipeline can run without API calls."""
+
+import asyncio
+import uuid
+from typing import Optional
+
+from livekit import rtc
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    APIConnectOptions,
+    NotGivenOr,
+    llm,
+    stt,
+    tts,
+)
+from livekit.agents.utils import AudioBuffer
+from livekit.agents.voice import io
+
+
+class FakeSTT(stt.STT):
+    """
+    Non-streaming STT that "recognizes" whatever transcript is queued next.
+
+    The session wraps it in a VAD-driven StreamAdapter, so recognition is triggered
+    by the real VAD exactly like a batch STT provider would be.
+    """
+
+    def __init__(self, *, latency: float = 0.1) -> None:
+        super().__init__(
+            capabilities=stt.STTCapabilities(streaming=False, interim_results=False)
+        )
+        self.latency = latency
+        self._transcripts: list[str] = []
+
+    def queue_transcript(self, text: str) -> None:
+        self._transcripts.append(text)
+
+    async def _recognize_impl(
+        self,
+        buffer: AudioBuffer,
+        *,
+        language: NotGivenOr[str] = "en",
+        conn_options: APIConnectOptions,
+    ) -> stt.SpeechEvent:
+        await asyncio.sleep(self.latency)
+        text = self._transcripts.pop(0) if self._transcripts else ""
+        return stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT,
+            request_id=uuid.uuid4().hex,
+            alternatives=[stt.SpeechData(language="en", text=text)],
+        )
+
+
+class FakeStreamingSTT(stt.STT):
+    """
+    Streaming STT that reports each queued utterance like a provider with
+    end-of-turn detection: start of speech, a preflight transcript, then the final
+    transcript and end of speech.
+
+    Used with `turn_detection="stt"` it drives user turns, and the preemptive
+    replies started by the preflight transcript, without audio or a VAD.
+    """
+
+    def __init__(self, *, speech_duration: float = 0.1) -> None:
+        super().__init__(
+            capabilities=stt.STTCapabilities(streaming=True, interim_results=True)
+        )
+        self.speech_duration = speech_duration
+        self._utterances: asyncio.Queue[str] = asyncio.Queue()
+
+    def say(self, text: str) -> None:
+        self._utterances.put_nowait(text)
+
+    async def _recognize_impl(
+        self,
+        buffer: AudioBuffer,
+        *,
+        language: NotGivenOr[str] = "en",
+        conn_options: APIConnectOptions,
+    ) -> stt.SpeechEvent:
+        raise NotImplementedError("FakeStreamingSTT only streams")
+
+    def stream(
+        self,
+        *,
+        language: NotGivenOr[str] = "en",
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "FakeSpeechStream":
+        return FakeSpeechStream(stt=self, conn_options=conn_options)
+
+
+class FakeSpeechStream(stt.RecognizeStream):
+    async def _run(self) -> None:
+        fake_stt: FakeStreamingSTT = self._stt
+
+        async def discard_audio() -> None:
+            async for _ in self._input_ch:
+                pass
+
+        audio_task = asyncio.create_task(discard_audio())
+        try:
+            while True:
+                text = await fake_stt._utterances.get()
+                self._send(stt.SpeechEventType.START_OF_SPEECH)
+                self._send(stt.SpeechEventType.PREFLIGHT_TRANSCRIPT, text)
+                await asyncio.sleep(fake_stt.speech_duration)
+                self._send(stt.SpeechEventType.FINAL_TRANSCRIPT, text)
+                self._send(stt.SpeechEventType.END_OF_SPEECH)
+        finally:
+            audio_task.cancel()
+
+    def _send(
+        self, event_type: stt.SpeechEventType, text: Optional[str] = None
+    ) -> None:
+        self._event_ch.send_nowait(
+            stt.SpeechEvent(
+                type=event_type,
+                request_id=uuid.uuid4().hex,
+                alternatives=[stt.SpeechData(language="en", text=text)]
+                if text is not None
+                else [],
+            )
+        )
+
+
+class SilentAudioInput(io.AudioInput):
+    """Microphone stand-in that produces silence in real time, for FakeStreamingSTT."""
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 10) -> None:
+        super().__init__(label="SilentAudioInput")
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        await asyncio.sleep(self.frame_ms / 1000)
+        samples = self.sample_rate * self.frame_ms // 1000
+        return rtc.AudioFrame(
+            data=b"\x00\x00" * samples,
+            sample_rate=self.sample_rate,
+            num_channels=1,
+            samples_per_channel=samples,
+        )
+
+
+class FakeLLM(llm.LLM):
+    """LLM that echoes the last user message after a fixed time-to-first-token."""
+
+    def __init__(self, *, ttft: float = 0.3, tokens_per_second: float = 60) -> None:
+        super().__init__()
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: Optional[list[llm.Tool]] = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs,
+    ) -> "FakeLLMStream":
+        return FakeLLMStream(
+            self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options
+        )
+
+
+class FakeLLMStream(llm.LLMStream):
+    async def _run(self) -> None:
+        fake_llm: FakeLLM = self._llm
+        user_messages = [m for m in self._chat_ctx.messages() if m.role == "user"]
+        reply = user_messages[-1].text_content if user_messages else "Hello!"
+        words = (reply or "Okay.").split()
+        request_id = uuid.uuid4().hex
+
+        await asyncio.sleep(fake_llm.ttft)
+        for word in words:
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    id=request_id,
+                    delta=llm.ChoiceDelta(role="assistant", content=f"{word} "),
+                )
+            )
+            await asyncio.sleep(1 / fake_llm.tokens_per_second)
+
+        prompt_tokens = sum(
+            len((m.text_content or "").split()) for m in self._chat_ctx.messages()
+        )
+        self._event_ch.send_nowait(
+            llm.ChatChunk(
+                id=request_id,
+                usage=llm.CompletionUsage(
+                    completion_tokens=len(words),
+                    prompt_tokens=prompt_tokens,
+                    total_tokens=prompt_tokens + len(words),
+                ),
+            )
+        )
+
+
+class FakeTTS(tts.TTS):
+    """TTS that returns silence, ~60ms of audio per character, after a fixed latency."""
+
+    def __init__(self, *, latency: float = 0.15, sample_rate: int = 24000) -> None:
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=sample_rate,
+            num_channels=1,
+        )
+        self.latency = latency
+
+    def synthesize(
+        self,
+        text: str,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "FakeChunkedStream":
+        return FakeChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class FakeChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        fake_tts: FakeTTS = self._tts
+        await asyncio.sleep(fake_tts.latency)
+
+        output_emitter.initialize(
+            request_id=uuid.uuid4().hex,
+            sample_rate=fake_tts.sample_rate,
+            num_channels=1,
+            mime_type="audio/pcm",
+        )
+        num_samples = int(fake_tts.sample_rate * 0.06 * max(1, len(self.input_text)))
+        output_emitter.push(b"\x00\x00" * num_samples)
+        output_emitter.flush()
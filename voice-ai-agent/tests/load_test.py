@@ -0,0 +1,96 @@
+"""
+Ramp simulated rooms on one worker process until latency SLOs break.
+
+Each step runs the pipeline benchmark (see pipeline_bench.py) with more concurrent
+rooms sharing one set of models, as the agent does in density mode, and stops at
+the first step whose p95 end-of-speech to first-audio latency exceeds the SLO or
+that misses a turn.
+
+Usage:
+    uv run python tests/load_test.py --slo-p95 2.0 --max-rooms 64
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from pipeline_bench import (
+    BenchModels,
+    Fixture,
+    load_fixtures,
+    load_models,
+    run_benchmark,
+)
+
+logger = logging.getLogger("load_test")
+
+# End-of-speech to first agent audio, in seconds. The fake providers add ~0.55s,
+# so this leaves about as much headroom as real calls get over provider latency.
+DEFAULT_SLO_P95 = 2.0
+
+
+def ramp_steps(max_rooms: int) -> list[int]:
+    """Room counts to try: 1, 2, 4, ... up to and including max_rooms."""
+    steps = []
+    rooms = 1
+    while rooms < max_rooms:
+        steps.append(rooms)
+        rooms *= 2
+    steps.append(max_rooms)
+    return steps
+
+
+async def ramp(
+    fixtures: list[Fixture],
+    max_rooms: int = 64,
+    slo_p95: float = DEFAULT_SLO_P95,
+    models: Optional[BenchModels] = None,
+) -> dict:
+    """
+    Run the benchmark at increasing room counts until the SLO breaks.
+
+    Returns:
+        The report of every step, plus the largest room count that met the SLO
+    """
+    models = models or load_models()
+    steps = []
+    max_rooms_within_slo: Optional[int] = None
+
+    for rooms in ramp_steps(max_rooms):
+        report = await run_benchmark(fixtures, sessions=rooms, models=models)
+        report["within_slo"] = (
+            report["missed_turns"] == 0 and report["eos_to_first_audio_p95"] <= slo_p95
+        )
+        steps.append(report)
+        logger.info(
+            f"{rooms} rooms: p95 {report['eos_to_first_audio_p95']:.2f}s, "
+            f"{report['cpu_share_per_room']:.1%} of a core per room"
+        )
+
+        if not report["within_slo"]:
+            break
+        max_rooms_within_slo = rooms
+
+    return {
+        "slo_p95": slo_p95,
+        "max_rooms_within_slo": max_rooms_within_slo,
+        "steps": steps,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--slo-p95", type=float, default=DEFAULT_SLO_P95)
+    parser.add_argument("--max-rooms", type=int, default=64)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fixtures = load_fixtures()[:1]
+    result = asyncio.run(ramp(fixtures, args.max_rooms, args.slo_p95))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
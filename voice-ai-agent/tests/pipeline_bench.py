@@ -0,0 +1,398 @@
+"""
+Offline latency and capacity benchmark for the voice pipeline.
+
+Feeds the WAV fixtures in tests/fixtures/audio (16-bit mono, with a matching .txt
+transcript) through an AgentSession that runs the real Silero VAD and
+MultilingualModel turn detector, with local fake STT/LLM/TTS plugins in place of
+the LiveKit Inference models. Concurrent sessions share the models the same way
+the agent's density mode does (see src/density.py). Audio is played in real time,
+so the numbers reflect what a room would see minus the network and model-provider
+latency.
+
+Reports:
+    - end-of-speech to first agent audio (p50/p95/max)
+    - VAD and turn-detector CPU seconds per second of input audio
+    - process memory per concurrent session
+
+Usage:
+    uv run python tests/pipeline_bench.py --sessions 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+import wave
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import psutil
+from fake_plugins import FakeLLM, FakeSTT, FakeTTS
+from livekit import rtc
+from livekit.agents import AgentSession, MetricsCollectedEvent, metrics
+from livekit.agents.voice import io
+from livekit.plugins import silero
+from livekit.plugins.turn_detector.multilingual import _EUORunnerMultilingual
+
+from agent import Assistant
+from density import SharedInferenceExecutor, SharedTurnDetector, current_room
+
+logger = logging.getLogger("pipeline_bench")
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "audio"
+
+FRAME_MS = 10
+
+# Samples quieter than this (int16 RMS over one frame) count as silence when
+# locating the end of speech in a fixture
+SILENCE_RMS = 300
+
+# How long to wait for the agent to answer a turn before counting it as missed
+REPLY_TIMEOUT = 10.0
+
+
+@dataclass
+class Fixture:
+    name: str
+    sample_rate: int
+    pcm: np.ndarray
+    transcript: str
+    speech_end: float
+    """Offset in seconds where the last voiced frame ends."""
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / self.sample_rate
+
+
+def load_fixture(path: Path) -> Fixture:
+    """Load a 16-bit mono WAV fixture and locate where its speech ends."""
+    with wave.open(str(path), "rb") as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1:
+            raise ValueError(f"{path.name}: fixtures must be 16-bit mono WAV")
+        sample_rate = f.getframerate()
+        pcm = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+
+    frame_size = sample_rate * FRAME_MS // 1000
+    speech_end = 0.0
+    for start in range(0, len(pcm), frame_size):
+        frame = pcm[start : start + frame_size].astype(np.float64)
+        if np.sqrt(np.mean(frame**2)) > SILENCE_RMS:
+            speech_end = (start + len(frame)) / sample_rate
+
+    transcript_path = path.with_suffix(".txt")
+    transcript = transcript_path.read_text().strip() if transcript_path.exists() else ""
+
+    return Fixture(
+        name=path.stem,
+        sample_rate=sample_rate,
+        pcm=pcm,
+        transcript=transcript,
+        speech_end=speech_end,
+    )
+
+
+def load_fixtures(directory: Path = FIXTURES_DIR) -> list[Fixture]:
+    return [load_fixture(path) for path in sorted(directory.glob("*.wav"))]
+
+
+class WavAudioInput(io.AudioInput):
+    """
+    Microphone stand-in that plays fixtures in real time.
+
+    Like a real participant track it never runs dry: between fixtures it produces
+    silence, paced at one frame every FRAME_MS.
+    """
+
+    def __init__(self, sample_rate: int) -> None:
+        super().__init__(label="WavAudioInput")
+        self.sample_rate = sample_rate
+        self._frame_size = sample_rate * FRAME_MS // 1000
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._speech_end_sample: Optional[int] = None
+        self._speech_ended = asyncio.Event()
+        self.speech_ended_at = 0.0
+        self._next_frame_at: Optional[float] = None
+
+    async def play(self, fixture: Fixture) -> float:
+        """Queue a fixture and return the wall time at which its speech ended."""
+        if fixture.sample_rate != self.sample_rate:
+            raise ValueError(f"{fixture.name}: expected {self.sample_rate} Hz audio")
+
+        self._speech_ended.clear()
+        self._speech_end_sample = len(self._pending) + int(
+            fixture.speech_end * fixture.sample_rate
+        )
+        self._pending = np.concatenate([self._pending, fixture.pcm])
+        await self._speech_ended.wait()
+        return self.speech_ended_at
+
+    async def wait_until_drained(self) -> None:
+        while len(self._pending):
+            await asyncio.sleep(FRAME_MS / 1000)
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        now = time.perf_counter()
+        if self._next_frame_at is None:
+            self._next_frame_at = now
+        elif self._next_frame_at > now:
+            await asyncio.sleep(self._next_frame_at - now)
+        self._next_frame_at += FRAME_MS / 1000
+
+        frame = self._pending[: self._frame_size]
+        self._pending = self._pending[self._frame_size :]
+        if len(frame) < self._frame_size:
+            frame = np.pad(frame, (0, self._frame_size - len(frame)))
+
+        if self._speech_end_sample is not None:
+            self._speech_end_sample -= self._frame_size
+            if self._speech_end_sample <= 0:
+                self._speech_end_sample = None
+                self.speech_ended_at = time.perf_counter()
+                self._speech_ended.set()
+
+        return rtc.AudioFrame(
+            data=frame.tobytes(),
+            sample_rate=self.sample_rate,
+            num_channels=1,
+            samples_per_channel=self._frame_size,
+        )
+
+
+class TimedAudioOutput(io.AudioOutput):
+    """Speaker stand-in that timestamps the first frame of every reply and plays in real time."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            label="TimedAudioOutput",
+            capabilities=io.AudioOutputCapabilities(pause=False),
+        )
+        self.first_frame = asyncio.Event()
+        self.first_frame_at = 0.0
+        self._segment_started_at: Optional[float] = None
+        self._segment_duration = 0.0
+        self._finish_handle: Optional[asyncio.TimerHandle] = None
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if self._segment_started_at is None:
+            self._segment_started_at = time.perf_counter()
+            self._segment_duration = 0.0
+            if not self.first_frame.is_set():
+                self.first_frame_at = self._segment_started_at
+                self.first_frame.set()
+            self.on_playback_started(created_at=time.time())
+        self._segment_duration += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        if self._segment_started_at is None:
+            return
+
+        remaining = (
+            self._segment_started_at + self._segment_duration - time.perf_counter()
+        )
+        self._finish_handle = asyncio.get_running_loop().call_later(
+            max(0.0, remaining), self._finish, False
+        )
+
+    def clear_buffer(self) -> None:
+        if self._finish_handle is not None:
+            self._finish_handle.cancel()
+        if self._segment_started_at is not None:
+            self._finish(True)
+
+    def _finish(self, interrupted: bool) -> None:
+        if self._segment_started_at is None:
+            return
+
+        position = min(
+            time.perf_counter() - self._segment_started_at, self._segment_duration
+        )
+        self._segment_started_at = None
+        self._finish_handle = None
+        self.on_playback_finished(playback_position=position, interrupted=interrupted)
+
+
+@dataclass
+class BenchModels:
+    """Models shared by every simulated room, as in the agent's density mode."""
+
+    vad: silero.VAD
+    executor: SharedInferenceExecutor
+    turn_detector: Optional[SharedTurnDetector]
+
+
+def load_models() -> BenchModels:
+    """Load the shared models; the turn detector is None if its weights are missing."""
+    executor = SharedInferenceExecutor()
+    try:
+        executor.load(_EUORunnerMultilingual.INFERENCE_METHOD)
+        turn_detector = SharedTurnDetector(executor)
+    except Exception as e:
+        logger.warning(
+            f"Turn detector unavailable, falling back to VAD endpointing "
+            f"(run `uv run src/agent.py download-files`): {e}"
+        )
+        turn_detector = None
+
+    return BenchModels(
+        vad=silero.VAD.load(), executor=executor, turn_detector=turn_detector
+    )
+
+
+@dataclass
+class SessionResult:
+    latencies: list[float] = field(default_factory=list)
+    missed_turns: int = 0
+    audio_seconds: float = 0.0
+    vad_inference_seconds: float = 0.0
+    turn_detector_seconds: float = 0.0
+
+
+async def run_session(
+    fixtures: list[Fixture], models: BenchModels, room_name: str
+) -> SessionResult:
+    """Play every fixture as one user turn and time the agent's replies."""
+    # Attribute shared turn-detector work to this simulated room
+    current_room.set(room_name)
+    turn_detector_start = models.executor.room_inference_seconds.get(room_name, 0.0)
+
+    result = SessionResult()
+    fake_stt = FakeSTT()
+    audio_input = WavAudioInput(sample_rate=fixtures[0].sample_rate)
+    audio_output = TimedAudioOutput()
+
+    # Mirrors the pipeline in agent.py, with the cloud models swapped for fakes
+    session = AgentSession(
+        stt=fake_stt,
+        llm=FakeLLM(),
+        tts=FakeTTS(),
+        turn_detection=models.turn_detector
+        if models.turn_detector is not None
+        else "vad",
+        vad=models.vad,
+        preemptive_generation=True,
+    )
+    session.input.audio = audio_input
+    session.output.audio = audio_output
+
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        if isinstance(ev.metrics, metrics.VADMetrics):
+            result.vad_inference_seconds += ev.metrics.inference_duration_total
+
+    await session.start(agent=Assistant(), record=False)
+    try:
+        for fixture in fixtures:
+            fake_stt.queue_transcript(fixture.transcript)
+            audio_output.first_frame.clear()
+
+            speech_ended_at = await audio_input.play(fixture)
+            try:
+                await asyncio.wait_for(audio_output.first_frame.wait(), REPLY_TIMEOUT)
+                result.latencies.append(audio_output.first_frame_at - speech_ended_at)
+                await audio_output.wait_for_playout()
+            except asyncio.TimeoutError:
+                logger.warning(f"No reply to fixture {fixture.name}")
+                result.missed_turns += 1
+
+            await audio_input.wait_until_drained()
+            result.audio_seconds += fixture.duration
+    finally:
+        await session.aclose()
+
+    result.turn_detector_seconds = (
+        models.executor.room_inference_seconds.get(room_name, 0.0) - turn_detector_start
+    )
+    return result
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def run_benchmark(
+    fixtures: list[Fixture], sessions: int = 1, models: Optional[BenchModels] = None
+) -> dict:
+    """Run `sessions` concurrent sessions over the fixtures and summarize the results."""
+    process = psutil.Process()
+    if models is None:
+        models = load_models()
+
+    baseline_rss = peak_rss = process.memory_info().rss
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, process.memory_info().rss)
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_memory())
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    requests_start = models.executor.requests
+    queue_wait_start = models.executor.queue_wait_seconds
+    try:
+        results = await asyncio.gather(
+            *(
+                run_session(fixtures, models, room_name=f"bench-{sessions}-{i}")
+                for i in range(sessions)
+            )
+        )
+    finally:
+        sampler.cancel()
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.perf_counter() - wall_start
+
+    latencies = [latency for r in results for latency in r.latencies]
+    audio_seconds = sum(r.audio_seconds for r in results) or 1.0
+    requests = models.executor.requests - requests_start
+    queue_wait = models.executor.queue_wait_seconds - queue_wait_start
+    # Fraction of one core each room keeps busy, everything included
+    cpu_share_per_room = cpu_seconds / wall_seconds / sessions
+
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "missed_turns": sum(r.missed_turns for r in results),
+        "turn_detector": "multilingual" if models.turn_detector is not None else "vad",
+        "eos_to_first_audio_p50": statistics.median(latencies) if latencies else 0.0,
+        "eos_to_first_audio_p95": _percentile(latencies, 0.95),
+        "eos_to_first_audio_max": max(latencies, default=0.0),
+        # Wall time spent in inference; process CPU below is the figure for sizing
+        "vad_seconds_per_audio_second": sum(r.vad_inference_seconds for r in results)
+        / audio_seconds,
+        "turn_detector_seconds_per_audio_second": sum(
+            r.turn_detector_seconds for r in results
+        )
+        / audio_seconds,
+        "turn_detector_requests": requests,
+        "turn_detector_avg_queue_wait": queue_wait / requests if requests else 0.0,
+        "process_cpu_per_audio_second": cpu_seconds / audio_seconds,
+        "cpu_share_per_room": cpu_share_per_room,
+        "rooms_per_core": 1 / cpu_share_per_room if cpu_share_per_room else 0.0,
+        "rss_per_session_mb": (peak_rss - baseline_rss) / sessions / 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent sessions")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run_benchmark(load_fixtures(args.fixtures), args.sessions))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
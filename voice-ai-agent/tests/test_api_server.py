@@ -0,0 +1,162 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from opentelemetry import context as otel_context
+
+import api_server
+from resilience import Upstream
+from tracing import room_context, room_trace_id
+from upstreams import UpstreamClients
+
+
+def _new_job() -> api_server.PackageJob:
+    return api_server.PackageJob(
+        job_id="test",
+        created_at=time.time(),
+        stages=[api_server.PackageStage(name=n) for n in api_server.PACKAGE_STAGES],
+    )
+
+
+def _stage(job: api_server.PackageJob, name: str) -> api_server.PackageStage:
+    return next(s for s in job.stages if s.name == name)
+
+
+@pytest.fixture
+def fake_upstreams(monkeypatch, tmp_path):
+    """Replace ElevenLabs, fal.ai and ffmpeg with slow local fakes."""
+    uploads = []
+
+    def compose_music(prompt, duration_seconds):
+        time.sleep(0.3)
+        return b"ID3 song"
+
+    def upload(data, content_type, file_name=None):
+        time.sleep(0.3)
+        uploads.append((data, content_type, file_name))
+        return f"https://fal.media/files/{file_name}"
+
+    def render_video(image_url, audio_url, resolution, on_progress=None):
+        on_progress("Rendering")
+        return "video_test.mp4", "https://fal.media/files/video.mp4"
+
+    monkeypatch.setattr(api_server, "music_dir", tmp_path)
+    monkeypatch.setattr(api_server, "compose_music", compose_music)
+    monkeypatch.setattr(api_server, "trim_audio", lambda data: data[:3])
+    monkeypatch.setattr(api_server, "render_video", render_video)
+    monkeypatch.setattr(
+        UpstreamClients, "fal", property(lambda self: SimpleNamespace(upload=upload))
+    )
+    monkeypatch.setattr(api_server, "fal_upstream", Upstream("fal"))
+    return uploads
+
+
+@pytest.mark.asyncio
+async def test_package_pipeline_overlaps_stages(fake_upstreams) -> None:
+    """Image upload runs alongside music generation and audio never touches disk twice."""
+    job = _new_job()
+
+    start = time.perf_counter()
+    await api_server.run_package_pipeline(
+        job, b"\x89PNG", "image/png", "sarah.png", "upbeat pop", 30, "480p"
+    )
+    elapsed = time.perf_counter() - start
+
+    assert job.status == "done", job.error
+    assert all(stage.status == "done" for stage in job.stages)
+    assert job.file_url == "/videos/video_test.mp4"
+    assert job.music_url == f"/music/{job.music_filename}"
+
+    upload_image = _stage(job, "upload_image")
+    generate_music = _stage(job, "generate_music")
+    assert upload_image.started_at < generate_music.finished_at
+    assert generate_music.started_at < upload_image.finished_at
+    # Sequential stages would take at least 0.9s (upload + music + audio upload)
+    assert elapsed < 0.85
+
+    # The trimmed song is uploaded from memory
+    assert (b"ID3", "audio/mpeg", f"trimmed_{job.music_filename}") in fake_upstreams
+    assert _stage(job, "render_video").detail == "Rendering"
+
+
+@pytest.mark.asyncio
+async def test_package_pipeline_reports_failed_stage(
+    fake_upstreams, monkeypatch
+) -> None:
+    def compose_music(prompt, duration_seconds):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(api_server, "compose_music", compose_music)
+    job = _new_job()
+
+    await api_server.run_package_pipeline(
+        job, b"\x89PNG", "image/png", "sarah.png", "upbeat pop", 30, "480p"
+    )
+
+    assert job.status == "failed"
+    assert job.error == "quota exceeded"
+    assert _stage(job, "generate_music").status == "failed"
+    assert _stage(job, "render_video").status == "skipped"
+
+
+@pytest.mark.asyncio
+async def test_package_pipeline_waits_for_music_when_upload_fails(
+    fake_upstreams, monkeypatch
+) -> None:
+    """A failed image upload doesn't leave music generation running on a failed job."""
+
+    def upload(data, content_type, file_name=None):
+        raise RuntimeError("upload rejected")
+
+    monkeypatch.setattr(
+        UpstreamClients, "fal", property(lambda self: SimpleNamespace(upload=upload))
+    )
+    job = _new_job()
+
+    await api_server.run_package_pipeline(
+        job, b"\x89PNG", "image/png", "sarah.png", "upbeat pop", 30, "480p"
+    )
+
+    # Music generation was still running when the upload failed; by the time
+    # the job is reported as failed it has finished, and nothing changes after
+    assert job.status == "failed"
+    assert job.error == "upload rejected"
+    statuses = {stage.name: stage.status for stage in job.stages}
+    assert statuses == {
+        "upload_image": "failed",
+        "generate_music": "done",
+        "trim_audio": "skipped",
+        "upload_audio": "skipped",
+        "render_video": "skipped",
+    }
+    assert job.music_url == f"/music/{job.music_filename}"
+
+
+@pytest.mark.asyncio
+async def test_package_pipeline_is_traced_per_stage(fake_upstreams, spans) -> None:
+    """Every stage and upstream call lands in the room's trace."""
+    job = _new_job()
+
+    token = otel_context.attach(room_context("birthday-room"))
+    try:
+        await api_server.run_package_pipeline(
+            job, b"\x89PNG", "image/png", "sarah.png", "upbeat pop", 30, "480p"
+        )
+    finally:
+        otel_context.detach(token)
+
+    finished = spans.get_finished_spans()
+    by_name = {span.name: span for span in finished}
+    assert {span.context.trace_id for span in finished} == {
+        room_trace_id("birthday-room")
+    }
+
+    pipeline = by_name["package_pipeline"]
+    for name in api_server.PACKAGE_STAGES:
+        assert by_name[f"stage {name}"].parent.span_id == pipeline.context.span_id
+    # Upload calls go through the fal.ai circuit breaker and nest under their stage
+    assert by_name["fal.upload"].parent.span_id in {
+        by_name["stage upload_image"].context.span_id,
+        by_name["stage upload_audio"].context.span_id,
+    }
+    assert by_name["save_music"].attributes["file.name"] == job.music_filename
@@ -0,0 +1,222 @@
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import artifacts
+import public_http
+from artifacts import ArtifactNotFoundError, ArtifactResolver, RemoteAudioRejectedError
+
+SONG = "music_20250101_120000.mp3"
+
+
+@pytest.fixture
+def resolver(tmp_path) -> ArtifactResolver:
+    music_dir = tmp_path / "generated_music"
+    music_dir.mkdir()
+    (music_dir / SONG).write_bytes(b"ID3 song")
+    return ArtifactResolver(
+        music_dir,
+        base_urls=["https://birthdai.example.com", "https://api.example.com/v1/"],
+        cache_dir=tmp_path / "audio_cache",
+    )
+
+
+@pytest.fixture
+def remote_audio():
+    """
+    Serve audio from a local HTTP server and count the requests it gets.
+
+    The server listens on every loopback address and records which one each
+    request came in on.
+    """
+    hits = []
+    addresses = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            addresses.append(self.connection.getsockname()[0])
+            if self.path == "/redirect.mp3":
+                self.send_response(302)
+                self.send_header("Location", "http://169.254.169.254/latest/meta-data")
+                self.end_headers()
+                return
+            if self.path != "/remote.mp3":
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.end_headers()
+            self.wfile.write(b"ID3 remote")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", hits, addresses
+    server.shutdown()
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        SONG,
+        f"/music/{SONG}",
+        f"https://birthdai.example.com/music/{SONG}",
+        f"HTTPS://BirthdAI.example.com:443/music/{SONG}?t=1",
+        f"https://api.example.com/v1/music/{SONG}",
+        # The URL the current request came in on counts as ours too
+        f"http://10.0.0.5:8000/music/{SONG}",
+    ],
+)
+def test_own_urls_resolve_without_network(resolver, url) -> None:
+    path = resolver.resolve(url, extra_base_urls=["http://10.0.0.5:8000/"])
+    assert path == resolver.music_dir / SONG
+    assert resolver.downloads == 0
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/music/missing.mp3",
+        "/music/../.env.local",
+        f"https://birthdai.example.com/music/sub/{SONG}",
+    ],
+)
+def test_missing_own_artifacts_are_not_fetched(resolver, url) -> None:
+    with pytest.raises(ArtifactNotFoundError):
+        resolver.resolve(url)
+
+
+@pytest.fixture
+def public_test_server(monkeypatch):
+    """Treat 127.0.0.1 as a public address, and nothing else."""
+    real_check = public_http.is_public_ip
+    monkeypatch.setattr(
+        public_http,
+        "is_public_ip",
+        lambda address: address == "127.0.0.1" or real_check(address),
+    )
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1:8000/music/song.mp3",
+        "http://localhost/song.mp3",
+        "http://[::1]/song.mp3",
+        "http://10.0.0.5/song.mp3",
+        "http://192.168.1.20/song.mp3",
+        "http://169.254.169.254/latest/meta-data",
+        "file:///etc/passwd",
+        "ftp://example.com/song.mp3",
+    ],
+)
+def test_internal_urls_are_refused(resolver, url) -> None:
+    with pytest.raises(RemoteAudioRejectedError):
+        resolver.resolve(url)
+    assert resolver.downloads == 0
+
+
+def test_loopback_server_is_never_contacted(resolver, remote_audio) -> None:
+    base_url, hits, _ = remote_audio
+
+    with pytest.raises(RemoteAudioRejectedError):
+        resolver.resolve(f"{base_url}/remote.mp3")
+    assert hits == []
+
+
+def test_redirects_to_internal_hosts_are_refused(
+    resolver, remote_audio, public_test_server
+) -> None:
+    base_url, hits, _ = remote_audio
+
+    with pytest.raises(RemoteAudioRejectedError):
+        resolver.resolve(f"{base_url}/redirect.mp3")
+    assert hits == ["/redirect.mp3"]
+    assert not list(resolver.cache_dir.iterdir())
+
+
+def test_remote_audio_is_downloaded_once(
+    resolver, remote_audio, public_test_server
+) -> None:
+    base_url, hits, _ = remote_audio
+
+    first = resolver.resolve(f"{base_url}/remote.mp3")
+    second = resolver.resolve(f"{base_url}/remote.mp3")
+
+    assert first == second
+    assert first.read_bytes() == b"ID3 remote"
+    assert hits == ["/remote.mp3"]
+    assert (resolver.downloads, resolver.cache_hits) == (1, 1)
+
+    # Another server's /music/ path is still remote
+    with pytest.raises(requests.HTTPError):
+        resolver.resolve(f"{base_url}/music/{SONG}")
+    assert not list(resolver.cache_dir.glob("*.part"))
+
+
+def test_concurrent_downloads_of_one_url(
+    resolver, remote_audio, public_test_server
+) -> None:
+    base_url, _, _ = remote_audio
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(
+            pool.map(lambda _: resolver.resolve(f"{base_url}/remote.mp3"), range(8))
+        )
+
+    assert len(set(paths)) == 1
+    assert paths[0].read_bytes() == b"ID3 remote"
+    assert not list(resolver.cache_dir.glob("*.part"))
+
+
+def test_rebinding_dns_cannot_redirect_the_connection(
+    resolver, remote_audio, public_test_server, monkeypatch
+) -> None:
+    """A host that resolves to a public address, then to loopback, is pinned."""
+    base_url, hits, addresses = remote_audio
+    port = base_url.rsplit(":", 1)[1]
+    real_getaddrinfo = socket.getaddrinfo
+    answers = ["127.0.0.1", "127.0.0.2"]
+    lookups = []
+
+    def rebinding_getaddrinfo(host, *args, **kwargs):
+        if host != "rebind.example":
+            return real_getaddrinfo(host, *args, **kwargs)
+        lookups.append(host)
+        address = answers[min(len(lookups), len(answers)) - 1]
+        return real_getaddrinfo(address, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", rebinding_getaddrinfo)
+
+    path = resolver.resolve(f"http://rebind.example:{port}/remote.mp3")
+
+    # The host was looked up once, and the connection went to that address
+    assert path.read_bytes() == b"ID3 remote"
+    assert lookups == ["rebind.example"]
+    assert addresses == ["127.0.0.1"]
+
+    # Answering with the internal address first is refused before connecting
+    answers.reverse()
+    lookups.clear()
+    with pytest.raises(RemoteAudioRejectedError):
+        resolver.resolve(f"http://rebind.example:{port}/other.mp3")
+    assert hits == ["/remote.mp3"]
+
+
+def test_oversized_remote_audio_is_rejected(
+    resolver, remote_audio, public_test_server, monkeypatch
+) -> None:
+    base_url, _, _ = remote_audio
+    monkeypatch.setattr(artifacts, "MAX_DOWNLOAD_BYTES", 4)
+
+    with pytest.raises(RemoteAudioRejectedError, match="larger than"):
+        resolver.resolve(f"{base_url}/remote.mp3")
+    assert not list(resolver.cache_dir.iterdir())
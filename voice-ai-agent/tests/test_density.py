@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+from livekit.agents.inference_runner import _InferenceRunner
+
+from density import SharedInferenceExecutor, SharedTurnDetector, current_room
+
+
+class _EchoRunner(_InferenceRunner):
+    INFERENCE_METHOD = "test_density_echo"
+    calls = 0
+
+    def initialize(self) -> None:
+        pass
+
+    def run(self, data: bytes) -> bytes:
+        _EchoRunner.calls += 1
+        return json.dumps({"echo": json.loads(data)}).encode()
+
+
+if _EchoRunner.INFERENCE_METHOD not in _InferenceRunner.registered_runners:
+    _InferenceRunner.register_runner(_EchoRunner)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rooms_share_one_inference_thread() -> None:
+    """Requests from concurrent rooms each run once, and time is attributed per room."""
+    executor = SharedInferenceExecutor()
+    executor.load(_EchoRunner.INFERENCE_METHOD)
+    _EchoRunner.calls = 0
+
+    async def infer(room: str, payload: dict) -> dict:
+        current_room.set(room)
+        result = await executor.do_inference(
+            _EchoRunner.INFERENCE_METHOD, json.dumps(payload).encode()
+        )
+        return json.loads(result)
+
+    results = await asyncio.gather(
+        infer("room-a", {"text": "happy birthday"}),
+        infer("room-b", {"text": "happy birthday"}),
+        infer("room-c", {"text": "see you at the party"}),
+    )
+
+    assert [r["echo"]["text"] for r in results] == [
+        "happy birthday",
+        "happy birthday",
+        "see you at the party",
+    ]
+    assert executor.requests == _EchoRunner.calls == 3
+    assert set(executor.room_inference_seconds) == {"room-a", "room-b", "room-c"}
+
+
+@pytest.mark.asyncio
+async def test_single_request_is_not_held_back() -> None:
+    """With nothing else queued, a request runs straight away."""
+    executor = SharedInferenceExecutor()
+    executor.load(_EchoRunner.INFERENCE_METHOD)
+
+    for _ in range(5):
+        await executor.do_inference(_EchoRunner.INFERENCE_METHOD, b"{}")
+
+    assert executor.queue_wait_seconds / executor.requests < 0.002
+
+
+def test_shared_turn_detector_honors_remote_endpoint(monkeypatch) -> None:
+    """With a remote EOT endpoint, no local languages.json is needed."""
+    monkeypatch.setenv("LIVEKIT_REMOTE_EOT_URL", "http://eot.example.com")
+    executor = SharedInferenceExecutor()
+
+    detector = SharedTurnDetector(executor, unlikely_threshold=0.2)
+
+    assert detector._executor is executor
+    assert detector._languages == {}
+    assert detector._unlikely_threshold == 0.2
@@ -0,0 +1,23 @@
+import pytest
+from load_test import ramp, ramp_steps
+from pipeline_bench import load_fixtures
+
+
+def test_ramp_steps() -> None:
+    assert ramp_steps(1) == [1]
+    assert ramp_steps(6) == [1, 2, 4, 6]
+    assert ramp_steps(8) == [1, 2, 4, 8]
+
+
+@pytest.mark.asyncio
+async def test_ramp_stops_when_slo_breaks(bench_models) -> None:
+    """An SLO tighter than the pipeline's floor breaks on the first step."""
+    fixtures = load_fixtures()[:1]
+
+    result = await ramp(fixtures, max_rooms=4, slo_p95=0.01, models=bench_models)
+
+    assert result["max_rooms_within_slo"] is None
+    assert len(result["steps"]) == 1
+    assert not result["steps"][0]["within_slo"]
+    assert result["steps"][0]["turn_detector"] == "multilingual"
+    assert result["steps"][0]["cpu_share_per_room"] > 0
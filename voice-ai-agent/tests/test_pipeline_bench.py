@@ -0,0 +1,29 @@
+import pytest
+from pipeline_bench import load_fixtures, run_benchmark
+
+
+def test_fixtures_have_speech_and_transcripts() -> None:
+    """Every fixture ends its speech before the audio does and has a transcript."""
+    fixtures = load_fixtures()
+    assert fixtures
+
+    for fixture in fixtures:
+        assert fixture.transcript
+        assert 0 < fixture.speech_end < fixture.duration
+
+
+@pytest.mark.asyncio
+async def test_pipeline_latency_offline(bench_models) -> None:
+    """The agent answers every fixture with the local pipeline and reports its cost."""
+    fixtures = load_fixtures()[:1]
+
+    report = await run_benchmark(fixtures, sessions=2, models=bench_models)
+
+    assert report["turn_detector"] == "multilingual"
+    assert report["turns"] == 2
+    assert report["missed_turns"] == 0
+    assert 0 < report["eos_to_first_audio_p50"] < 5
+    assert report["vad_seconds_per_audio_second"] > 0
+    assert report["turn_detector_seconds_per_audio_second"] > 0
+    assert report["turn_detector_requests"] > 0
+    assert report["rss_per_session_mb"] >= 0
@@ -0,0 +1,246 @@
+import errno
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import api_server
+from resilience import (
+    MAX_CONCURRENT_HEDGES,
+    CircuitOpenError,
+    Deadline,
+    Upstream,
+    is_transient,
+)
+from upstreams import UpstreamClients
+
+
+class UpstreamError(Exception):
+    """Stand-in for an SDK error carrying an HTTP status code."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FaultyService:
+    """Local fake upstream that fails, hangs or answers according to a script."""
+
+    def __init__(self, *outcomes) -> None:
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, float):
+            time.sleep(outcome)
+            return "slow"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_and_recovers() -> None:
+    clock = FakeClock()
+    upstream = Upstream("fake", failure_threshold=3, reset_timeout=10, clock=clock)
+    service = FaultyService(UpstreamError(503))
+
+    for _ in range(3):
+        with pytest.raises(UpstreamError):
+            upstream.call(service)
+
+    # Open: calls fail immediately without reaching the upstream
+    with pytest.raises(CircuitOpenError) as excinfo:
+        upstream.call(service)
+    assert service.calls == 3
+    assert excinfo.value.retry_after == 10
+
+    # Half-open: one failed probe opens the breaker again
+    clock.now = 10
+    with pytest.raises(UpstreamError):
+        upstream.call(service)
+    assert upstream.breaker.state == "open"
+
+    # A successful probe closes it
+    clock.now = 20
+    service.outcomes = ["ok"]
+    assert upstream.call(service) == "ok"
+    assert upstream.snapshot()["state"] == "closed"
+    assert upstream.snapshot()["short_circuited"] == 1
+
+
+def test_retries_transient_failures_only() -> None:
+    upstream = Upstream("fake", base_delay=0.01)
+
+    flaky = FaultyService(UpstreamError(503), ConnectionError(), "ok")
+    assert upstream.call(flaky, attempts=3) == "ok"
+    assert flaky.calls == 3
+    assert upstream.counters["retries"] == 2
+
+    # Client errors aren't retried and don't count against the breaker
+    rejected = FaultyService(UpstreamError(422))
+    with pytest.raises(UpstreamError):
+        upstream.call(rejected, attempts=3)
+    assert rejected.calls == 1
+    assert upstream.breaker.state == "closed"
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        requests.ConnectionError(),
+        requests.Timeout(),
+        httpx.ConnectError("refused"),
+        TimeoutError(),
+        UpstreamError(429),
+        UpstreamError(502),
+    ],
+)
+def test_transport_failures_are_transient(error) -> None:
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        OSError(errno.ENOSPC, "No space left on device"),
+        KeyError("video"),
+        TypeError("unexpected keyword"),
+        ValueError("bad audio"),
+        UpstreamError(404),
+    ],
+)
+def test_local_faults_are_not_retried(error) -> None:
+    upstream = Upstream("fake", failure_threshold=1, base_delay=0)
+    service = FaultyService(error)
+
+    with pytest.raises(type(error)):
+        upstream.call(service, attempts=3)
+
+    assert service.calls == 1
+    assert upstream.breaker.state == "closed"
+
+
+def test_local_faults_leave_the_breaker_alone() -> None:
+    """A local error neither closes a half-open breaker nor resets the failure count."""
+    clock = FakeClock()
+    upstream = Upstream("fake", failure_threshold=2, reset_timeout=10, clock=clock)
+    disk_full = OSError(errno.ENOSPC, "No space left on device")
+
+    with pytest.raises(UpstreamError):
+        upstream.call(FaultyService(UpstreamError(503)))
+    with pytest.raises(OSError):
+        upstream.call(FaultyService(disk_full))
+    with pytest.raises(UpstreamError):
+        upstream.call(FaultyService(UpstreamError(503)))
+    assert upstream.breaker.state == "open"
+
+    # A probe that fails locally keeps the breaker half-open for the next probe
+    clock.now = 10
+    with pytest.raises(OSError):
+        upstream.call(FaultyService(disk_full))
+    assert upstream.breaker.state == "half_open"
+
+    # A 4xx is still an answer from the upstream, so it closes the breaker
+    with pytest.raises(UpstreamError):
+        upstream.call(FaultyService(UpstreamError(422)))
+    assert upstream.breaker.state == "closed"
+
+
+def test_deadline_bounds_retries() -> None:
+    upstream = Upstream("fake", failure_threshold=100, base_delay=0.1, max_delay=0.1)
+    service = FaultyService(UpstreamError(502))
+
+    start = time.perf_counter()
+    with pytest.raises(UpstreamError):
+        upstream.call(service, attempts=100, deadline=Deadline(0.3))
+
+    assert time.perf_counter() - start < 0.5
+    assert service.calls < 10
+
+
+def test_slow_poll_is_hedged() -> None:
+    upstream = Upstream("fake")
+    service = FaultyService(1.0, "done")
+
+    start = time.perf_counter()
+    assert upstream.call(service, hedge_after=0.05) == "done"
+
+    assert time.perf_counter() - start < 0.5
+    assert upstream.counters["hedges"] == 1
+    assert upstream.counters["hedge_wins"] == 1
+
+
+def test_polls_beyond_the_hedge_pool_are_not_queued() -> None:
+    """With more slow polls in flight than hedge threads, none waits for a slot."""
+    upstream = Upstream("fake")
+    service = FaultyService(0.3)
+    polls = MAX_CONCURRENT_HEDGES * 3
+    results = []
+
+    def poll() -> None:
+        results.append(upstream.call(service, hedge_after=0.05))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=poll) for _ in range(polls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Queued primaries would take three rounds of 0.3s
+    assert time.perf_counter() - start < 0.6
+    assert results == ["slow"] * polls
+    assert upstream.counters["hedges"] <= MAX_CONCURRENT_HEDGES
+    assert upstream.counters["hedges"] + upstream.counters["hedges_skipped"] == polls
+    assert service.calls == polls + upstream.counters["hedges"]
+
+
+def test_music_endpoint_fails_fast_once_elevenlabs_is_down(monkeypatch) -> None:
+    """During an outage, requests stop waiting on ElevenLabs once the breaker opens."""
+
+    def stream(**kwargs):
+        time.sleep(0.2)
+        raise UpstreamError(503)
+
+    fake_elevenlabs = SimpleNamespace(music=SimpleNamespace(stream=stream))
+    monkeypatch.setattr(
+        UpstreamClients, "elevenlabs", property(lambda self: fake_elevenlabs)
+    )
+    monkeypatch.setattr(api_server.clients, "elevenlabs_api_key", "test")
+    monkeypatch.setattr(
+        api_server,
+        "elevenlabs_upstream",
+        Upstream("elevenlabs", failure_threshold=2, base_delay=0),
+    )
+    client = TestClient(api_server.app)
+    body = {"prompt": "upbeat birthday pop", "duration_seconds": 30}
+
+    # Music generation is billed per attempt, so failures aren't retried; two
+    # failed requests open the breaker
+    assert client.post("/api/generate-music", json=body).status_code == 500
+    assert client.post("/api/generate-music", json=body).status_code == 500
+
+    start = time.perf_counter()
+    response = client.post("/api/generate-music", json=body)
+    assert time.perf_counter() - start < 0.1
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+
+    metrics = client.get("/metrics").json()["upstreams"]["elevenlabs"]
+    assert metrics["state"] == "open"
+    assert metrics["calls"] == 2
+    assert metrics["short_circuited"] == 1
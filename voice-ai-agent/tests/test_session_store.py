@@ -0,0 +1,168 @@
+import asyncio
+import os
+import re
+import statistics
+import time
+
+import pytest
+from fake_plugins import FakeLLM, FakeStreamingSTT, SilentAudioInput
+from livekit.agents import AgentSession, MetricsCollectedEvent, llm, metrics
+
+from agent import Assistant
+from session_store import (
+    MAX_CHAT_ITEMS,
+    MAX_PINNED_CHARS,
+    MAX_SUMMARY_CHARS,
+    RoomSession,
+    SessionStore,
+)
+
+# A 30-minute call with a user turn roughly every 10 seconds, played back faster
+SESSION_SECONDS = 30 * 60
+TURN_INTERVAL_SECONDS = 10
+
+# The session waits ENDPOINTING_DELAY after the user stops speaking before it
+# replies, long enough for a reply generated preemptively to be ready by then
+LLM_TTFT = 0.05
+ENDPOINTING_DELAY = 0.1
+
+
+def _user_text(turn: int) -> str:
+    return (
+        f"Turn {turn}: my friend Sarah loves hiking, baking sourdough on Sundays "
+        "and always brings snacks for everyone when we go camping together."
+    )
+
+
+@pytest.mark.asyncio
+async def test_prompt_size_and_latency_are_bounded_over_long_session() -> None:
+    """Tokens-per-turn and reply latency stay flat over a 30-minute synthetic session."""
+    turns = SESSION_SECONDS // TURN_INTERVAL_SECONDS
+    room_session = RoomSession(room_name="birthday-room")
+    assistant = Assistant(room_session=room_session)
+    fake_stt = FakeStreamingSTT(speech_duration=0.05)
+
+    # The pipeline in agent.py, with preemptive generation, minus audio
+    session = AgentSession(
+        stt=fake_stt,
+        llm=FakeLLM(ttft=LLM_TTFT, tokens_per_second=1000),
+        turn_detection="stt",
+        min_endpointing_delay=ENDPOINTING_DELAY,
+        preemptive_generation=True,
+    )
+    session.input.audio = SilentAudioInput()
+
+    # As in agent.py: one record per LLM request, including preemptive ones
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        if isinstance(ev.metrics, metrics.LLMMetrics):
+            room_session.record_turn(
+                prompt_tokens=ev.metrics.prompt_tokens,
+                completion_tokens=ev.metrics.completion_tokens,
+                ttft=ev.metrics.ttft,
+                duration=ev.metrics.duration,
+            )
+
+    replies: asyncio.Queue[llm.ChatMessage] = asyncio.Queue()
+
+    @session.on("conversation_item_added")
+    def _on_conversation_item_added(ev):
+        if ev.item.type == "message" and ev.item.role == "assistant":
+            replies.put_nowait(ev.item)
+
+    await session.start(agent=assistant, record=False)
+    latencies = []
+    try:
+        for turn in range(turns):
+            fake_stt.say(_user_text(turn))
+            reply = await asyncio.wait_for(replies.get(), 5)
+            # End of the user's speech to the start of the reply
+            latencies.append(reply.metrics["e2e_latency"])
+    finally:
+        await session.aclose()
+
+    # Compacting the history never invalidated a preemptive reply: every turn
+    # took exactly one LLM request, and late replies are as quick as early ones
+    stats = room_session.stats()
+    assert stats["turns"] == turns
+    early_turns = MAX_CHAT_ITEMS // 2
+    assert statistics.mean(latencies[early_turns:]) <= (
+        statistics.mean(latencies[:early_turns]) + LLM_TTFT / 2
+    )
+
+    # The chat window is capped, so the largest prompt is close to the average
+    assert stats["max_prompt_tokens"] <= stats["avg_prompt_tokens"] * 1.5
+    assert len(assistant.chat_ctx.copy(exclude_instructions=True).items) <= (
+        MAX_CHAT_ITEMS
+    )
+
+    # Older turns are folded into the summary rather than lost
+    assert room_session.summary
+    assert len(room_session.pinned_summary) <= MAX_PINNED_CHARS
+    assert len(room_session.summary) <= MAX_SUMMARY_CHARS
+    assert room_session.recall() in assistant.instructions
+
+    # The first things the user said are still there at the end of the call, and
+    # the summary carries on where the chat window starts
+    assert _user_text(0) in assistant.instructions
+    remembered = [int(t) for t in re.findall(r"Turn (\d+):", room_session.recall())]
+    in_window = [
+        int(t)
+        for msg in assistant.chat_ctx.messages()
+        if msg.role == "user"
+        for t in re.findall(r"Turn (\d+):", msg.text_content)
+    ]
+    assert remembered[-1] + 1 == in_window[0]
+
+
+def test_session_store_round_trip(tmp_path) -> None:
+    """Room state survives a reconnect to the same room."""
+    store = SessionStore(tmp_path)
+    room_session = store.get("birthday/room 1")
+    room_session.remember("My friend Sarah turns 30 on Friday.")
+    room_session.add_artifact("music_20250101_120000.mp3")
+    room_session.record_turn(
+        prompt_tokens=420, completion_tokens=30, ttft=0.4, duration=1.2
+    )
+
+    chat_ctx = llm.ChatContext.empty()
+    for turn in range(MAX_CHAT_ITEMS * 2):
+        chat_ctx.add_message(role="user", content=_user_text(turn))
+    room_session.save_chat_ctx(chat_ctx)
+    store.release("birthday/room 1")
+
+    restored = SessionStore(tmp_path).get("birthday/room 1")
+    assert restored.recall() == "My friend Sarah turns 30 on Friday."
+    assert restored.artifact_ids == ["music_20250101_120000.mp3"]
+    assert restored.stats()["max_prompt_tokens"] == 420
+    assert len(restored.load_chat_ctx().items) == MAX_CHAT_ITEMS
+
+
+def test_pinned_statements_survive_a_long_summary() -> None:
+    room_session = RoomSession(room_name="birthday-room")
+    room_session.remember("My friend is called Sarah and she turns 30 on Friday.")
+    for turn in range(100):
+        room_session.remember(_user_text(turn))
+
+    recalled = room_session.recall()
+    assert recalled.startswith("My friend is called Sarah and she turns 30 on Friday.")
+    assert "Turn 99:" in recalled
+    assert "Turn 50:" not in recalled
+    assert len(recalled) <= MAX_PINNED_CHARS + MAX_SUMMARY_CHARS + 5
+
+
+def test_stored_sessions_expire(tmp_path) -> None:
+    """Session files, which hold what the user said, don't pile up on disk."""
+    store = SessionStore(tmp_path, ttl=60, max_files=3)
+    for room in range(5):
+        store.get(f"room-{room}").remember(f"Room {room} is for Sarah.")
+        store.release(f"room-{room}")
+
+    # Only the newest rooms are kept
+    assert len(list(tmp_path.glob("*.json"))) == 3
+
+    # An expired room starts over, and its file is deleted
+    stale = time.time() - 120
+    os.utime(tmp_path / "room-4.json", (stale, stale))
+    assert SessionStore(tmp_path, ttl=60).get("room-4").recall() == ""
+    assert not (tmp_path / "room-4.json").exists()
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import api_server
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+# Importing api_server took ~1.6s when it loaded every upstream SDK up front;
+# FastAPI itself accounts for most of what's left
+STARTUP_BUDGET_SECONDS = 1.0
+
+# Upstream SDKs that must only be imported on first use
+LAZY_MODULES = ["elevenlabs", "fal_client", "livekit.api", "pydub", "requests"]
+
+_MEASURE_IMPORT = f"""
+import sys, time
+start = time.perf_counter()
+import api_server
+print(time.perf_counter() - start)
+print(",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))
+"""
+
+
+def _measure_import(cwd: Path) -> tuple[float, str]:
+    result = subprocess.run(
+        [sys.executable, "-c", _MEASURE_IMPORT],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": str(SRC_DIR)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds, loaded = result.stdout.splitlines()
+    return float(seconds), loaded
+
+
+def test_import_stays_within_startup_budget(tmp_path) -> None:
+    # Best of two, so a cold filesystem cache doesn't count against us
+    (first, loaded), (second, _) = _measure_import(tmp_path), _measure_import(tmp_path)
+
+    assert loaded == ""
+    assert min(first, second) < STARTUP_BUDGET_SECONDS
+    # Directories are created by the lifespan, not at import time
+    assert not list(tmp_path.iterdir())
+
+
+def test_readiness_follows_lifespan(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(api_server.app)
+
+    assert client.get("/livez").status_code == 200
+    assert client.get("/readyz").status_code == 503
+
+    with client:
+        response = client.get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert (tmp_path / "generated_music").is_dir()
+        assert (tmp_path / "generated_videos").is_dir()
+
+    assert client.get("/readyz").status_code == 503
@@ -0,0 +1,88 @@
+import json
+
+from fastapi.testclient import TestClient
+from opentelemetry import trace
+from opentelemetry.trace import format_span_id, format_trace_id
+
+import api_server
+from tracing import (
+    ROOM_ATTRIBUTE,
+    JsonLinesSpanExporter,
+    room_context,
+    room_root_span_id,
+    room_trace_id,
+)
+
+ROOM = "transcription-1732280000000"
+
+
+def _room_root_span_id() -> int:
+    return trace.get_current_span(room_context(ROOM)).get_span_context().span_id
+
+
+def test_api_requests_join_the_room_trace(spans, monkeypatch) -> None:
+    """The agent and the API derive the same trace from the LiveKit room name."""
+    monkeypatch.setattr(
+        api_server.clients, "livekit_url", "wss://example.livekit.cloud"
+    )
+    monkeypatch.setattr(api_server.clients, "livekit_api_key", "key")
+    monkeypatch.setattr(api_server.clients, "livekit_api_secret", "secret" * 8)
+    client = TestClient(api_server.app)
+
+    response = client.post(
+        "/api/livekit-token",
+        json={"room_name": ROOM, "participant_name": "user-1"},
+        headers={"X-Room-Name": ROOM},
+    )
+    assert response.status_code == 200
+
+    trace_id = format_trace_id(room_trace_id(ROOM))
+    assert response.headers["X-Trace-Id"] == trace_id
+
+    (span,) = [
+        s
+        for s in spans.get_finished_spans()
+        if s.name == "POST /api/livekit-token"
+        and s.instrumentation_scope.name == "birthdai"
+    ]
+    assert span.context.trace_id == room_trace_id(ROOM)
+    # Parented to the same room root span the agent's job attaches to
+    assert span.parent.span_id == _room_root_span_id()
+    assert span.attributes[ROOM_ATTRIBUTE] == ROOM
+    assert span.attributes["http.route"] == "/api/livekit-token"
+
+    # The token request records that root span, so backends see a complete tree
+    (root,) = [s for s in spans.get_finished_spans() if s.name == "livekit_room"]
+    assert root.parent is None
+    assert root.context.trace_id == room_trace_id(ROOM)
+    assert root.context.span_id == room_root_span_id(ROOM) == _room_root_span_id()
+    assert root.attributes[ROOM_ATTRIBUTE] == ROOM
+
+    # It is recorded once per room, however many participants join
+    client.post(
+        "/api/livekit-token",
+        json={"room_name": ROOM, "participant_name": "user-2"},
+        headers={"X-Room-Name": ROOM},
+    )
+    assert [s.name for s in spans.get_finished_spans()].count("livekit_room") == 1
+
+    # Requests without a room start their own trace
+    other = client.get("/livez")
+    assert other.headers["X-Trace-Id"] != trace_id
+
+
+def test_spans_export_as_json_lines(spans, tmp_path) -> None:
+    with api_server.tracer.start_as_current_span(
+        "render_video.poll", context=room_context(ROOM), attributes={"poll": 1}
+    ):
+        pass
+
+    path = tmp_path / "traces.jsonl"
+    JsonLinesSpanExporter(str(path)).export(spans.get_finished_spans())
+
+    (record,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert record["name"] == "render_video.poll"
+    assert record["trace_id"] == format_trace_id(room_trace_id(ROOM))
+    assert record["parent_id"] == format_span_id(_room_root_span_id())
+    assert record["attributes"] == {"poll": 1}
+    assert record["duration_ms"] >= 0